@@ -134,6 +134,6 @@ async def process_proposal_sync(proposal_id: int, job_id: str) -> dict:
             f"Process and sync proposal {proposal_id} from Offorte to Airtable",
             deps=deps
         )
-        return result.data
+        return result.output
     finally:
         await deps.cleanup()
@@ -5,19 +5,26 @@ Implements 6 essential tools for webhook validation, API fetching, data transfor
 and Airtable synchronization.
 """
 
-import hashlib
 import hmac
-import json
 import re
 import asyncio
 import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Iterable, Iterator, Optional
 from uuid import uuid4
 
+import httpx
+import orjson
 from pydantic_ai import RunContext
-from pyairtable import Api as AirtableApi
 from loguru import logger
+from tenacity import (
+    RetryCallState,
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential,
+)
 
 from backend.core.dependencies import AgentDependencies
 
@@ -26,12 +33,20 @@ from backend.core.dependencies import AgentDependencies
 # Tool 1: validate_webhook
 # ============================================================================
 
-def validate_webhook(payload: dict, signature: str, secret: str) -> Dict[str, Any]:
+# Hex-encoded HMAC-SHA256 digests are always 64 characters long
+_SIGNATURE_LENGTH = 64
+_HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+def validate_webhook(raw_body: bytes, signature: str, secret: str) -> Dict[str, Any]:
     """
     Validate Offorte webhook signatures for security.
 
+    The signature covers the request body exactly as sent, so it is checked
+    against the raw bytes before the payload is parsed.
+
     Args:
-        payload: The webhook payload from Offorte
+        raw_body: The raw webhook request body from Offorte
         signature: The signature header from request
         secret: Webhook secret from environment
 
@@ -39,21 +54,23 @@ def validate_webhook(payload: dict, signature: str, secret: str) -> Dict[str, An
         Dict with validation result
     """
     try:
-        # Generate expected signature using HMAC-SHA256
-        payload_str = json.dumps(payload, sort_keys=True)
-        expected_signature = hmac.new(
-            secret.encode(),
-            payload_str.encode(),
-            hashlib.sha256
-        ).hexdigest()
+        # Reject obviously malformed signatures before doing any HMAC work
+        if len(signature) != _SIGNATURE_LENGTH or not _HEX_DIGITS.issuperset(signature.lower()):
+            logger.warning("Malformed webhook signature received")
+            return {"valid": False, "error": "Malformed signature"}
 
-        # Constant-time comparison
-        is_valid = hmac.compare_digest(expected_signature, signature)
+        # Generate expected signature using HMAC-SHA256 (one-shot C implementation)
+        expected_digest = hmac.digest(secret.encode(), raw_body, "sha256")
+
+        # Constant-time comparison on the raw 32-byte digests (hex already validated above)
+        is_valid = hmac.compare_digest(expected_digest, bytes.fromhex(signature))
 
         if not is_valid:
             logger.warning("Invalid webhook signature received")
             return {"valid": False, "error": "Invalid signature"}
 
+        payload = orjson.loads(raw_body)
+
         # Extract event details
         event_type = payload.get("type", "")
         proposal_id = payload.get("data", {}).get("id", 0)
@@ -100,19 +117,8 @@ async def fetch_proposal_data(
         "Content-Type": "application/json"
     }
 
-    async def fetch_with_retry(url: str, retries: int = 3) -> dict:
-        """Fetch with exponential backoff retry."""
-        for attempt in range(retries):
-            try:
-                response = await deps.http_client.get(url, headers=headers)
-                response.raise_for_status()
-                return response.json()
-            except Exception as e:
-                if attempt == retries - 1:
-                    raise
-                wait_time = 2 ** attempt  # 1s, 2s, 4s
-                logger.warning(f"Retry {attempt + 1}/{retries} after {wait_time}s: {e}")
-                await asyncio.sleep(wait_time)
+    async def fetch_with_retry(url: str) -> dict:
+        return await _fetch_json(deps.http_client, url, headers)
 
     try:
         # Fetch main proposal data
@@ -120,22 +126,35 @@ async def fetch_proposal_data(
         proposal_url = f"{base_url}/proposals/{proposal_id}"
         proposal_data = await fetch_with_retry(proposal_url)
 
-        # Fetch proposal content (line items)
+        # Content, company and contacts are independent: fetch them concurrently
+        sub_urls = []
         if include_content:
-            content_url = f"{base_url}/proposals/{proposal_id}/content"
-            proposal_data["content"] = await fetch_with_retry(content_url)
-
-        # Fetch company details
+            sub_urls.append(("content", f"{base_url}/proposals/{proposal_id}/content"))
         if "company_id" in proposal_data:
-            company_url = f"{base_url}/companies/{proposal_data['company_id']}"
-            proposal_data["company"] = await fetch_with_retry(company_url)
-
-        # Fetch contact details
-        if "contact_ids" in proposal_data and proposal_data["contact_ids"]:
-            contacts = []
-            for contact_id in proposal_data["contact_ids"][:5]:  # Limit to 5 contacts
-                contact_url = f"{base_url}/contacts/{contact_id}"
-                contacts.append(await fetch_with_retry(contact_url))
+            sub_urls.append(("company", f"{base_url}/companies/{proposal_data['company_id']}"))
+        for contact_id in (proposal_data.get("contact_ids") or [])[:5]:  # Limit to 5 contacts
+            sub_urls.append(("contact", f"{base_url}/contacts/{contact_id}"))
+
+        results = await asyncio.gather(
+            *(fetch_with_retry(url) for _, url in sub_urls),
+            return_exceptions=True
+        )
+
+        contacts = []
+        for (kind, url), result in zip(sub_urls, results):
+            if isinstance(result, Exception):
+                # Content is required for element parsing; company/contacts are optional
+                if kind == "content":
+                    raise result
+                logger.warning(f"Skipping {kind} for proposal {proposal_id} ({url}): {result}")
+                continue
+
+            if kind == "contact":
+                contacts.append(result)
+            else:
+                proposal_data[kind] = result
+
+        if proposal_data.get("contact_ids"):
             proposal_data["contacts"] = contacts
 
         logger.info(f"Successfully fetched proposal {proposal_id}")
@@ -146,10 +165,52 @@ async def fetch_proposal_data(
         return {"error": str(e), "proposal_id": proposal_id}
 
 
+_FETCH_ATTEMPTS = 3
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    """Retry network errors, 429 and 5xx; other 4xx (e.g. a deleted contact) fail fast."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+def _log_retry(retry_state: RetryCallState) -> None:
+    logger.warning(
+        f"Retry {retry_state.attempt_number}/{_FETCH_ATTEMPTS} after "
+        f"{retry_state.next_action.sleep}s: {retry_state.outcome.exception()}"
+    )
+
+
+@retry(
+    stop=stop_after_attempt(_FETCH_ATTEMPTS),
+    wait=wait_exponential(multiplier=1, min=1, max=8),
+    retry=retry_if_exception(_is_retryable),
+    before_sleep=_log_retry,
+    reraise=True
+)
+async def _fetch_json(client: httpx.AsyncClient, url: str, headers: Dict[str, str]) -> dict:
+    """GET a JSON resource from Offorte with exponential backoff retry."""
+    response = await client.get(url, headers=headers)
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+
 # ============================================================================
 # Tool 3: parse_construction_elements
 # ============================================================================
 
+_MERK_RE = re.compile(r"Merk\s+(\d+):?\s*(.*)", re.IGNORECASE)
+_VARIANT_RE = re.compile(r"D(\d+)\.")
+_DIM_RE = re.compile(r"(\d+)\s*x\s*(\d+)\s*mm", re.IGNORECASE)
+
+# Element types: one case-insensitive alternation, mapped back to the display name
+_ELEMENT_TYPES = ("Draaikiep raam", "Vast raam", "Voordeur", "Achterdeur", "Tuindeur", "Schuifpui")
+_ELEMENT_TYPE_RE = re.compile("|".join(map(re.escape, _ELEMENT_TYPES)), re.IGNORECASE)
+_ELEMENT_TYPE_CANON = {etype.lower(): etype for etype in _ELEMENT_TYPES}
+
+
 def parse_construction_elements(
     proposal_content: dict,
     proposal_nr: str
@@ -164,68 +225,13 @@ def parse_construction_elements(
     Returns:
         List of normalized element dictionaries
     """
-    elements = []
-    current_brand = None
-    element_index = 0
-
-    # Element type patterns
-    ELEMENT_TYPES = [
-        "Draaikiep raam",
-        "Vast raam",
-        "Voordeur",
-        "Achterdeur",
-        "Tuindeur",
-        "Schuifpui"
-    ]
-
     try:
         # Parse line items
         line_items = proposal_content.get("blocks", [])
         if not line_items:
             line_items = proposal_content.get("line_items", [])
 
-        for item in line_items:
-            item_name = item.get("name", "")
-            item_description = item.get("description", "")
-
-            # Detect "Merk" blocks
-            merk_match = re.search(r"Merk\s+(\d+):?\s*(.*)", item_name, re.IGNORECASE)
-            if merk_match:
-                current_brand = f"Merk {merk_match.group(1)}"
-                continue
-
-            # Detect coupled variants (D1. D2. D3.)
-            variants_match = re.findall(r"D(\d+)\.", item_name)
-            is_coupled = len(variants_match) > 1
-
-            if is_coupled:
-                # Create separate elements for each variant
-                element_group_id = f"{proposal_nr}_group_{element_index}"
-                for variant_num in variants_match:
-                    element = _parse_single_element(
-                        item=item,
-                        brand=current_brand,
-                        variant=f"D{variant_num}",
-                        coupled=True,
-                        element_group_id=element_group_id,
-                        proposal_nr=proposal_nr,
-                        element_index=element_index
-                    )
-                    elements.append(element)
-                    element_index += 1
-            else:
-                # Single element
-                element = _parse_single_element(
-                    item=item,
-                    brand=current_brand,
-                    variant=None,
-                    coupled=False,
-                    element_group_id=None,
-                    proposal_nr=proposal_nr,
-                    element_index=element_index
-                )
-                elements.append(element)
-                element_index += 1
+        elements = list(_iter_elements(line_items, proposal_nr))
 
         logger.info(f"Parsed {len(elements)} construction elements from {proposal_nr}")
         return elements
@@ -235,47 +241,87 @@ def parse_construction_elements(
         return []
 
 
-def _parse_single_element(
-    item: dict,
-    brand: Optional[str],
-    variant: Optional[str],
-    coupled: bool,
-    element_group_id: Optional[str],
-    proposal_nr: str,
-    element_index: int
-) -> Dict[str, Any]:
-    """Helper to parse a single element from a line item."""
+def _iter_elements(line_items: Iterable[dict], proposal_nr: str) -> Iterator[Dict[str, Any]]:
+    """Yield elements from line items in a single pass, tracking the current Merk block."""
+    current_brand = None
+    element_index = 0
+
+    for item in line_items:
+        item_name = item.get("name", "")
+
+        # Detect "Merk" blocks
+        merk_match = _MERK_RE.search(item_name)
+        if merk_match:
+            current_brand = f"Merk {merk_match.group(1)}"
+            continue
+
+        # Detect coupled variants (D1. D2. D3.); a single variant is not coupled
+        variants_match = _VARIANT_RE.findall(item_name)
+        is_coupled = len(variants_match) > 1
+        variants = [f"D{num}" for num in variants_match] if is_coupled else [None]
+
+        # Type, dimensions and price are shared by all variants of an item
+        common = _parse_item_common(item)
+
+        for variant in variants:
+            yield _build_element(
+                common,
+                brand=current_brand,
+                variant=variant,
+                coupled=is_coupled,
+                proposal_nr=proposal_nr,
+                element_index=element_index
+            )
+            element_index += 1
+
+
+def _parse_item_common(item: dict) -> Dict[str, Any]:
+    """Helper to parse the fields shared by every element of a line item."""
 
     item_name = item.get("name", "")
     item_description = item.get("description", "")
 
     # Extract dimensions (e.g., "1200x2400mm" or "1200 x 2400 mm")
-    dimensions_match = re.search(r"(\d+)\s*x\s*(\d+)\s*mm", item_description, re.IGNORECASE)
+    dimensions_match = _DIM_RE.search(item_description)
     width_mm = int(dimensions_match.group(1)) if dimensions_match else None
     height_mm = int(dimensions_match.group(2)) if dimensions_match else None
 
     # Extract element type
-    element_type = "Overig"
-    ELEMENT_TYPES = ["Draaikiep raam", "Vast raam", "Voordeur", "Achterdeur", "Tuindeur", "Schuifpui"]
-    for etype in ELEMENT_TYPES:
-        if etype.lower() in item_name.lower():
-            element_type = etype
-            break
+    type_match = _ELEMENT_TYPE_RE.search(item_name)
+    element_type = _ELEMENT_TYPE_CANON[type_match.group().lower()] if type_match else "Overig"
 
     return {
-        "element_id": f"{proposal_nr}_{element_index}",
         "type": element_type,
-        "brand": brand or "Onbekend",
-        "location": None,  # TODO: Extract from description if present
         "width_mm": width_mm,
         "height_mm": height_mm,
-        "coupled": coupled,
-        "variant": variant,
         "price": float(item.get("price", 0.0)),
         "notes": item_description
     }
 
 
+def _build_element(
+    common: Dict[str, Any],
+    brand: Optional[str],
+    variant: Optional[str],
+    coupled: bool,
+    proposal_nr: str,
+    element_index: int
+) -> Dict[str, Any]:
+    """Helper to build a single element from parsed line item fields."""
+    return {
+        "element_id": f"{proposal_nr}_{element_index}",
+        "type": common["type"],
+        "brand": brand or "Onbekend",
+        "location": None,  # TODO: Extract from description if present
+        "width_mm": common["width_mm"],
+        "height_mm": common["height_mm"],
+        "coupled": coupled,
+        "variant": variant,
+        "price": common["price"],
+        "notes": common["notes"]
+    }
+
+
 # ============================================================================
 # Tool 4: transform_proposal_to_table_records
 # ============================================================================
@@ -296,12 +342,13 @@ def transform_proposal_to_table_records(
     """
     try:
         records = {}
+        dates = _DateContext.from_now()
 
         # Customer Portal (klantenportaal)
         records["klantenportaal"] = _transform_customer_portal(proposal)
 
         # Projects (projecten)
-        records["projecten"] = _transform_projects(proposal)
+        records["projecten"] = _transform_projects(proposal, dates)
 
         # Elements Review (elementen_review)
         records["elementen_review"] = _transform_elements(proposal, elements)
@@ -310,7 +357,7 @@ def transform_proposal_to_table_records(
         records["inmeetplanning"] = _transform_measurement_planning(proposal, elements)
 
         # Invoicing (facturatie) - 3 splits
-        records["facturatie"] = _transform_invoices(proposal)
+        records["facturatie"] = _transform_invoices(proposal, dates)
 
         # Door Specifications (deur_specificaties)
         records["deur_specificaties"] = _transform_door_specs(proposal, elements)
@@ -341,19 +388,17 @@ def _transform_customer_portal(proposal: dict) -> List[dict]:
     }]
 
 
-def _transform_projects(proposal: dict) -> List[dict]:
+def _transform_projects(proposal: dict, dates: "_DateContext") -> List[dict]:
     """Transform to projecten table format."""
     company = proposal.get("company", {})
-    project_date = _today()
-    end_date = _add_days(project_date, 60)
 
     return [{
         "Project Nummer": proposal.get("proposal_nr", ""),
         "Naam": proposal.get("name", ""),
         "Klant": company.get("name", ""),
         "Totaal Bedrag": float(proposal.get("total_price", 0.0)),
-        "Start Datum": project_date,
-        "Eind Datum": end_date,
+        "Start Datum": dates.today,
+        "Eind Datum": dates.project_end,
         "Status": "Gewonnen",
         "Verantwoordelijke": proposal.get("account_user_name", ""),
         "Offorte ID": str(proposal.get("id", ""))
@@ -397,34 +442,36 @@ def _transform_measurement_planning(proposal: dict, elements: List[dict]) -> Lis
     }]
 
 
-def _transform_invoices(proposal: dict) -> List[dict]:
+def _transform_invoices(proposal: dict, dates: "_DateContext") -> List[dict]:
     """Transform to facturatie table format with 30/65/5 splits."""
     total = float(proposal.get("total_price", 0.0))
     proposal_nr = proposal.get("proposal_nr", "")
-    today = _today()
-    project_start = _add_days(today, 14)
-    project_end = _add_days(today, 74)
+
+    # Final split takes the remainder so the three amounts add up to the total exactly
+    vooraf = round(total * 0.30, 2)
+    bij_start = round(total * 0.65, 2)
+    oplevering = round(total - vooraf - bij_start, 2)
 
     return [
         {
             "Order Nummer": proposal_nr,
             "Factuur Type": "30% - Vooraf",
-            "Bedrag": round(total * 0.30, 2),
-            "Datum": today,
+            "Bedrag": vooraf,
+            "Datum": dates.today,
             "Status": "Concept"
         },
         {
             "Order Nummer": proposal_nr,
             "Factuur Type": "65% - Start",
-            "Bedrag": round(total * 0.65, 2),
-            "Datum": project_start,
+            "Bedrag": bij_start,
+            "Datum": dates.invoice_start,
             "Status": "Gepland"
         },
         {
             "Order Nummer": proposal_nr,
             "Factuur Type": "5% - Oplevering",
-            "Bedrag": round(total * 0.05, 2),
-            "Datum": project_end,
+            "Bedrag": oplevering,
+            "Datum": dates.invoice_end,
             "Status": "Gepland"
         }
     ]
@@ -449,21 +496,25 @@ def _transform_door_specs(proposal: dict, elements: List[dict]) -> List[dict]:
 
 
 # Helper functions
-def _today() -> str:
-    """Current date in DD-MM-YYYY format."""
-    return datetime.now().strftime("%d-%m-%Y")
-
-
-def _add_days(date_str: str, days: int) -> str:
-    """Add days to DD-MM-YYYY format date."""
-    try:
-        date_obj = datetime.strptime(date_str, "%d-%m-%Y")
-        new_date = date_obj + timedelta(days=days)
-        return new_date.strftime("%d-%m-%Y")
-    except:
-        # Fallback if parsing fails
-        new_date = datetime.now() + timedelta(days=days)
-        return new_date.strftime("%d-%m-%Y")
+@dataclass(frozen=True)
+class _DateContext:
+    """Dates (DD-MM-YYYY) shared by all transforms of one proposal."""
+
+    today: str
+    invoice_start: str  # today + 14 days
+    project_end: str    # today + 60 days
+    invoice_end: str    # today + 74 days
+
+    @classmethod
+    def from_now(cls) -> "_DateContext":
+        """Compute all dates from a single clock read."""
+        now = datetime.now()
+        return cls(
+            today=now.strftime("%d-%m-%Y"),
+            invoice_start=(now + timedelta(days=14)).strftime("%d-%m-%Y"),
+            project_end=(now + timedelta(days=60)).strftime("%d-%m-%Y"),
+            invoice_end=(now + timedelta(days=74)).strftime("%d-%m-%Y"),
+        )
 
 
 # ============================================================================
@@ -493,8 +544,7 @@ async def sync_to_airtable(
     deps = ctx.deps
 
     try:
-        api = AirtableApi(deps.airtable_api_key)
-        table = api.table(base_id, table_name)
+        table = deps.airtable_api.table(base_id, table_name)
 
         created_count = 0
         updated_count = 0
@@ -508,32 +558,27 @@ async def sync_to_airtable(
             batch = records[i:i + batch_size]
 
             try:
-                # Upsert logic: check if records exist
-                for record in batch:
-                    key_value = record.get(key_field)
-                    if key_value:
-                        # Search for existing record
-                        formula = f"{{{key_field}}} = '{key_value}'"
-                        existing = table.all(formula=formula)
-
-                        if existing:
-                            # Update existing
-                            updated = table.update(existing[0]["id"], record)
-                            record_ids.append(updated["id"])
-                            updated_count += 1
-                        else:
-                            # Create new
-                            created = table.create(record)
-                            record_ids.append(created["id"])
-                            created_count += 1
-                    else:
-                        # No key field, just create
-                        created = table.create(record)
-                        record_ids.append(created["id"])
-                        created_count += 1
-
-                # Rate limit: 5 req/sec = 0.2s between requests
-                await asyncio.sleep(0.21)
+                keyed = [{"fields": record} for record in batch if record.get(key_field)]
+                unkeyed = [record for record in batch if not record.get(key_field)]
+
+                # Upsert: Airtable matches on key_field server-side (performUpsert)
+                # pyairtable is blocking; run it off the event loop so tables sync concurrently.
+                # The shared limiter keeps all concurrent table syncs within Airtable's 5 req/sec.
+                if keyed:
+                    async with deps.airtable_limiter:
+                        result = await asyncio.to_thread(
+                            table.batch_upsert, keyed, key_fields=[key_field], typecast=True
+                        )
+                    record_ids.extend(r["id"] for r in result["records"])
+                    created_count += len(result["createdRecords"])
+                    updated_count += len(result["updatedRecords"])
+
+                # No key field, just create
+                if unkeyed:
+                    async with deps.airtable_limiter:
+                        created = await asyncio.to_thread(table.batch_create, unkeyed, typecast=True)
+                    record_ids.extend(r["id"] for r in created)
+                    created_count += len(created)
 
             except Exception as batch_error:
                 logger.error(f"Batch sync error for {table_name}: {batch_error}")
@@ -620,19 +665,35 @@ async def process_won_proposal(
             "deur_specificaties": deps.airtable_base_stb_productie,
         }
 
-        for table_name, records in table_records.items():
-            if not records:  # Skip empty tables
-                continue
+        # Tables are independent: sync concurrently, at most 2 tables per base at a time
+        tables = {
+            name: (base_mapping.get(name, deps.airtable_base_stb_administratie), records)
+            for name, records in table_records.items()
+            if records
+        }
+        base_semaphores = {base_id: asyncio.Semaphore(2) for base_id, _ in tables.values()}
+
+        async def sync_table(table_name: str, base_id: str, records: List[dict]) -> Dict[str, Any]:
+            async with base_semaphores[base_id]:
+                return await sync_to_airtable(
+                    ctx,
+                    base_id,
+                    table_name,
+                    records,
+                    key_field="Order Nummer" if table_name != "klantenportaal" else "Offerte Nummer"
+                )
 
-            base_id = base_mapping.get(table_name, deps.airtable_base_stb_administratie)
+        # return_exceptions: one failing table is reported without cancelling the others
+        results = await asyncio.gather(
+            *(sync_table(name, base_id, records) for name, (base_id, records) in tables.items()),
+            return_exceptions=True
+        )
 
-            result = await sync_to_airtable(
-                ctx,
-                base_id,
-                table_name,
-                records,
-                key_field="Order Nummer" if table_name != "klantenportaal" else "Offerte Nummer"
-            )
+        for table_name, result in zip(tables, results):
+            if isinstance(result, Exception):
+                logger.error(f"Sync {correlation_id} to {table_name} raised: {result}")
+                errors.append(f"{table_name}: {result}")
+                continue
 
             sync_summary[table_name] = {
                 "created": result["created"],
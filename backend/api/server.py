@@ -4,20 +4,26 @@ FastAPI webhook server for receiving Offorte events.
 CRITICAL: Must respond within 5 seconds to avoid timeout.
 """
 
-import json
 from datetime import datetime
+from typing import List
+import orjson
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import ORJSONResponse
 from loguru import logger
 import redis.asyncio as redis
 
 from backend.core.settings import settings
+from backend.core.logging_config import configure_logging
 from backend.agent.tools import validate_webhook
-from backend.workers.worker import sync_proposal_task
+from backend.workers.worker import sync_proposal_task, sync_proposals_batch_task
+
+configure_logging()
 
 app = FastAPI(
     title="Offorte-Airtable Sync Server",
     description="Webhook receiver for Offorte proposal events",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Global Redis client
@@ -29,10 +35,10 @@ async def startup():
     """Initialize Redis connection on startup."""
     global redis_client
     logger.info(f"Connecting to Redis at {settings.redis_url}")
+    # Raw bytes replies: payloads go straight to orjson.loads, which takes bytes
     redis_client = await redis.from_url(
         settings.redis_url,
-        encoding="utf-8",
-        decode_responses=True
+        decode_responses=False
     )
     logger.info("Redis connection established")
 
@@ -79,11 +85,14 @@ async def receive_webhook(request: Request):
     """
     try:
         # Parse payload
-        payload = await request.json()
+        payload = orjson.loads(await request.body())
 
-        # Log the raw webhook data for debugging
-        logger.info(f"Raw webhook payload: {json.dumps(payload, indent=2)}")
-        logger.info(f"Headers: {dict(request.headers)}")
+        # Log the raw webhook data for debugging (only serialized when DEBUG is enabled)
+        logger.opt(lazy=True).debug(
+            "Raw webhook payload: {}",
+            lambda: orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode()
+        )
+        logger.opt(lazy=True).debug("Headers: {}", lambda: dict(request.headers))
 
         # Extract event type and proposal ID from Offorte payload format
         # Format: {"type": "proposal_won", "date_created": "...", "data": {...}}
@@ -102,7 +111,8 @@ async def receive_webhook(request: Request):
             logger.error(f"Invalid proposal ID format: {proposal_id}")
             raise HTTPException(status_code=400, detail="Invalid proposal ID")
 
-        logger.info(f"Received webhook: event={event_type}, proposal={proposal_id}")
+        # Constant-size summary at INFO; the full payload is only logged at DEBUG
+        logger.info(f"Received webhook: event={event_type}, proposal={proposal_id}, fields={len(proposal_data)}")
 
         # Queue for background processing (only for proposal_won events)
         if event_type == "proposal_won":
@@ -173,6 +183,29 @@ async def test_sync(proposal_id: int):
         }
 
 
+@app.post("/sync/batch")
+async def sync_batch(proposal_ids: List[int]):
+    """
+    Queue a batch sync for several proposals (catch-up backfills).
+
+    Usage: POST a JSON list of proposal IDs to /sync/batch
+    """
+    if not proposal_ids:
+        raise HTTPException(status_code=400, detail="No proposal IDs given")
+
+    logger.info(f"Batch sync triggered for {len(proposal_ids)} proposals")
+
+    task = sync_proposals_batch_task.delay(proposal_ids)
+    logger.info(f"Celery batch task {task.id} queued for proposals {proposal_ids}")
+
+    return {
+        "status": "accepted",
+        "proposal_count": len(proposal_ids),
+        "task_id": task.id,
+        "queued": True
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
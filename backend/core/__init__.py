@@ -4,8 +4,25 @@ Core Infrastructure Module
 Contains settings, providers, and dependency injection for the application.
 """
 
+from importlib import import_module
+
 from .settings import settings, load_settings
-from .providers import get_llm_model
-from .dependencies import AgentDependencies
+from .logging_config import configure_logging
+
+# Loaded on first access (PEP 562) so importing settings doesn't pull in
+# pydantic-ai/OpenAI and the HTTP clients
+_LAZY_EXPORTS = {
+    "get_llm_model": ".providers",
+    "AgentDependencies": ".dependencies",
+}
+
+__all__ = ["settings", "load_settings", "get_llm_model", "AgentDependencies", "configure_logging"]
+
 
-__all__ = ["settings", "load_settings", "get_llm_model", "AgentDependencies"]
+def __getattr__(name: str):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
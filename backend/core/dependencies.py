@@ -5,6 +5,9 @@ Agent dependencies for dependency injection into Pydantic AI runtime.
 from dataclasses import dataclass, field
 from typing import Optional
 import httpx
+from aiolimiter import AsyncLimiter
+from pyairtable import Api as AirtableApi, retry_strategy
+from requests.adapters import HTTPAdapter
 from backend.core.settings import Settings
 
 
@@ -30,6 +33,7 @@ class AgentDependencies:
     # Configuration
     max_retries: int = 3
     timeout: int = 30
+    airtable_rate_limit: int = 5
 
     # Session Context
     job_id: Optional[str] = None
@@ -42,6 +46,20 @@ class AgentDependencies:
         repr=False
     )
 
+    # Airtable API (lazy init, shared across table syncs)
+    _airtable_api: Optional[AirtableApi] = field(
+        default=None,
+        init=False,
+        repr=False
+    )
+
+    # Airtable rate limiter (lazy init, shared across table syncs)
+    _airtable_limiter: Optional[AsyncLimiter] = field(
+        default=None,
+        init=False,
+        repr=False
+    )
+
     @property
     def http_client(self) -> httpx.AsyncClient:
         """Lazy initialization of HTTP client."""
@@ -52,10 +70,37 @@ class AgentDependencies:
             )
         return self._http_client
 
+    @property
+    def airtable_api(self) -> AirtableApi:
+        """Lazy initialization of Airtable API client."""
+        if self._airtable_api is None:
+            self._airtable_api = AirtableApi(
+                self.airtable_api_key,
+                timeout=(5, self.timeout)
+            )
+            # Tables sync concurrently from worker threads; size the pool so
+            # connections are reused instead of discarded when it is full.
+            # Keeps pyairtable's default retry on 429 responses.
+            self._airtable_api.session.mount("https://", HTTPAdapter(
+                pool_connections=20,
+                pool_maxsize=50,
+                max_retries=retry_strategy()
+            ))
+        return self._airtable_api
+
+    @property
+    def airtable_limiter(self) -> AsyncLimiter:
+        """Lazy initialization of the Airtable requests-per-second limiter."""
+        if self._airtable_limiter is None:
+            self._airtable_limiter = AsyncLimiter(self.airtable_rate_limit, 1)
+        return self._airtable_limiter
+
     async def cleanup(self):
         """Cleanup resources."""
         if self._http_client:
             await self._http_client.aclose()
+        if self._airtable_api:
+            self._airtable_api.session.close()
 
     @classmethod
     def from_settings(cls, settings: Settings, **overrides):
@@ -69,7 +114,7 @@ class AgentDependencies:
         Returns:
             AgentDependencies: Configured dependencies
         """
-        return cls(
+        values = dict(
             offorte_api_key=settings.offorte_api_key,
             offorte_account_name=settings.offorte_account_name,
             offorte_base_url=settings.offorte_base_url,
@@ -80,5 +125,7 @@ class AgentDependencies:
             airtable_base_stb_productie=settings.airtable_base_stb_productie,
             max_retries=settings.max_retries,
             timeout=settings.timeout_seconds,
-            **overrides
+            airtable_rate_limit=settings.airtable_rate_limit,
         )
+        values.update(overrides)
+        return cls(**values)
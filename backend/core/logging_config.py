@@ -0,0 +1,29 @@
+"""
+Logging configuration for the Offorte-Airtable Sync Agent.
+
+Routes Loguru output through a background queue so log writes don't block
+the event loop or the sync threads.
+"""
+
+import sys
+
+from loguru import logger
+from backend.core.settings import settings
+
+
+def configure_logging() -> None:
+    """
+    Replace Loguru's default synchronous stderr sink with a queued one.
+
+    With enqueue=True, records are handed to a background thread that does
+    the actual stderr write. diagnose is disabled because it inspects frame
+    locals for every logged exception.
+    """
+    logger.remove()
+    logger.add(
+        sys.stderr,
+        level=settings.log_level.upper(),
+        enqueue=True,
+        backtrace=False,
+        diagnose=False
+    )
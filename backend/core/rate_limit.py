@@ -0,0 +1,40 @@
+"""
+Thread-safe rate limiting for the blocking API clients.
+
+The agent tools pace their async Airtable calls with aiolimiter; the sync
+services run in worker threads and use this token bucket instead.
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket shared between threads.
+
+    Allows `rate` acquisitions per second on average, with bursts of up to
+    `capacity`. The default capacity of 1 spaces calls evenly, so no
+    one-second window ever sees much more than `rate` calls.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        """Create a full bucket refilling at rate tokens per second."""
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take one token, sleeping until it is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token now (may go negative), so waiting threads queue in order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate
+
+        if wait > 0:
+            time.sleep(wait)
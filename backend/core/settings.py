@@ -4,6 +4,8 @@ Settings module for Offorte-Airtable Sync Agent.
 Uses python-dotenv and pydantic-settings for environment variable management.
 """
 
+import os
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 from dotenv import load_dotenv
@@ -43,6 +45,10 @@ class Settings(BaseSettings):
         default="https://api.openai.com/v1",
         description="Base URL for the LLM API"
     )
+    llm_cache_dir: str = Field(
+        default=".cache/llm_specs",
+        description="Directory for the LLM spec extraction cache (empty disables it)"
+    )
 
     # Server Configuration
     webhook_secret: str = Field(default="change-this-secret", description="Webhook validation secret")
@@ -63,6 +69,12 @@ class Settings(BaseSettings):
     timeout_seconds: int = Field(default=30, description="Request timeout in seconds")
 
 
+# Environment variables for the required (no default) settings fields
+_REQUIRED_ENV_VARS = tuple(
+    name.upper() for name, field in Settings.model_fields.items() if field.is_required()
+)
+
+
 def load_settings() -> Settings:
     """
     Load settings with proper error handling and environment loading.
@@ -73,8 +85,11 @@ def load_settings() -> Settings:
     Raises:
         ValueError: If required settings are missing or invalid
     """
-    # Load environment variables from .env file
-    load_dotenv()
+    # Load environment variables from .env file, unless the environment already
+    # provides everything required (containers, uvicorn workers re-importing).
+    # Settings still reads .env itself for optional values.
+    if not all(key in os.environ for key in _REQUIRED_ENV_VARS):
+        load_dotenv()
 
     try:
         return Settings()
@@ -0,0 +1,76 @@
+"""
+On-disk cache for LLM spec extractions.
+
+Content-addressed: the key is a hash of everything that determines the LLM
+output, so a changed prompt or changed HTML simply misses the cache.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+import orjson
+
+# How long cached LLM extractions stay valid
+LLM_CACHE_TTL_SECONDS = 30 * 24 * 3600
+
+
+class SpecCache:
+    """
+    On-disk cache of LLM spec extractions, keyed by a hash of the prompt inputs.
+
+    Backed by a single SQLite file so re-syncs and repeated standard products
+    skip the LLM call. Safe to share between the extraction threads; in WAL
+    mode so the Celery worker processes can share the file too (readers
+    don't block the writer).
+    """
+
+    def __init__(self, cache_dir: str, ttl_seconds: int = LLM_CACHE_TTL_SECONDS):
+        """Open (or create) the cache database in cache_dir."""
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(Path(cache_dir) / "llm_specs.sqlite3"),
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS specs (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """
+        Hash everything that determines the LLM output (prompt version, model, inputs).
+
+        Each part is length-prefixed, so HTML containing the separator can't
+        make two different sets of rows hash the same.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            data = part.encode()
+            digest.update(len(data).to_bytes(8, 'big'))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return cached specs, or None if missing or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM specs WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        return orjson.loads(row[0]) if row else None
+
+    def set(self, key: str, specs: Dict[str, Any]) -> None:
+        """Store specs for key."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO specs (key, value, expires) VALUES (?, ?, ?)",
+                (key, orjson.dumps(specs).decode(), time.time() + self.ttl_seconds)
+            )
+            self._conn.commit()
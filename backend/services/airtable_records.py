@@ -0,0 +1,51 @@
+"""
+Record cleaning for Airtable writes.
+
+Airtable rejects empty strings in singleSelect fields, and some of those
+fields spell "not applicable" as "N.v.t." (with period).
+"""
+
+from typing import Callable, Dict, Any, Iterable
+
+# singleSelect fields that use "N.v.t." (with period) in Airtable
+NVT_WITH_PERIOD_FIELDS = frozenset({
+    'Locatie',
+    'Cilinder Gelijksluitend',
+    'Brievenbus'
+})
+
+
+def make_record_cleaner(table_fields: Iterable[str]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Build the record cleaner for one table.
+
+    - Remove empty strings (causes issues with singleSelect fields)
+    - Remove None values
+    - Convert "N.v.t" to "N.v.t." for singleSelect fields that require it
+
+    Tables without any of those singleSelect fields get a cleaner that
+    skips the "N.v.t" check entirely.
+
+    Args:
+        table_fields: The table's Airtable field names
+
+    Returns:
+        Function mapping raw record data to cleaned record data
+    """
+    nvt_fields = NVT_WITH_PERIOD_FIELDS.intersection(table_fields)
+    if not nvt_fields:
+        def clean(record_data: Dict[str, Any]) -> Dict[str, Any]:
+            return {
+                key: value
+                for key, value in record_data.items()
+                if value is not None and value != ""
+            }
+        return clean
+
+    def clean_nvt(record_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            key: "N.v.t." if value == "N.v.t" and key in nvt_fields else value
+            for key, value in record_data.items()
+            if value is not None and value != ""
+        }
+    return clean_nvt
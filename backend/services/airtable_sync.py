@@ -4,12 +4,46 @@ Airtable sync service for pushing records to Airtable tables.
 Handles upsert operations based on key fields defined in field mappings.
 """
 
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Any, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from loguru import logger
 
+from backend.core.rate_limit import TokenBucket
 from backend.core.settings import settings
-from config.airtable_field_mappings import get_table_config, get_base_id_setting_name
+from backend.services.airtable_records import make_record_cleaner
+from config.airtable_field_mappings import TABLE_CONFIGS, get_base_id_setting_name
+
+# Airtable accepts at most 10 records per create/update request
+AIRTABLE_BATCH_SIZE = 10
+
+# Sync stages: tables within a stage have no dependencies on each other
+# STB-SALES: Klantenportaal -> Elements -> Specs/Nacalculatie -> Subproducten
+# STB-ADMINISTRATIE: Inmeetplanning, Projecten, Facturatie (independent)
+SYNC_STAGES = (
+    ("klantenportaal",),
+    ("elementen_overzicht", "inmeetplanning", "projecten", "facturatie"),
+    ("hoofdproduct_specificaties", "nacalculatie"),
+    ("subproducten",),
+)
+SYNC_MAX_WORKERS = 4
+
+# Escapes for values embedded in a single-quoted Airtable formula string
+_FORMULA_ESCAPE = str.maketrans({"'": "\\'", "\\": "\\\\"})
+
+
+class _WriteRetry(Retry):
+    """Retry for Airtable writes: only a 429 means Airtable did not process the write."""
+    RETRY_AFTER_STATUS_CODES = frozenset({429})
+
+
+def _pooled_session(retry: Retry) -> requests.Session:
+    """A requests session with a pooled keep-alive adapter for the Airtable API."""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=20, pool_maxsize=50, max_retries=retry))
+    return session
 
 
 class AirtableSync:
@@ -24,6 +58,25 @@ class AirtableSync:
             "Content-Type": "application/json"
         }
 
+        # Pooled sessions (keep-alive). Reads retry on 429/5xx; writes only on 429,
+        # since a 5xx or read timeout may come after Airtable applied the write
+        self.session = _pooled_session(Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            raise_on_status=False  # hand the last response to raise_for_status()
+        ))
+        self.write_session = _pooled_session(_WriteRetry(
+            total=3,
+            read=False,
+            backoff_factor=0.3,
+            status_forcelist=[429],
+            allowed_methods=frozenset({"POST", "PATCH"}),
+            raise_on_status=False
+        ))
+        for session in (self.session, self.write_session):
+            session.headers.update(self.headers)
+
         # Load base IDs from settings
         self.bases = {
             "sales": settings.airtable_base_stb_sales,
@@ -31,21 +84,87 @@ class AirtableSync:
             "productie": settings.airtable_base_stb_productie
         }
 
-    def _get_base_id(self, table_name: str) -> Optional[str]:
-        """Get base ID for a table."""
-        config = get_table_config(table_name)
-        if not config:
-            logger.error(f"Unknown table: {table_name}")
+        # Airtable allows 5 requests per second per base: one bucket per base, shared by
+        # every table thread and every proposal syncing through this instance
+        self._limiters: Dict[str, TokenBucket] = {
+            base_id: TokenBucket(settings.airtable_rate_limit)
+            for base_id in set(self.bases.values()) if base_id
+        }
+
+        # Resolve (base_id, airtable table name, key_field) once per table
+        self._table_meta: Dict[str, Tuple[Optional[str], str, str]] = {
+            internal_name: (self.bases.get(config.base_type), config.name, config.key_field)
+            for internal_name, config in TABLE_CONFIGS.items()
+        }
+
+        # Record cleaner per table, specialised on its "N.v.t." singleSelect fields
+        self._cleaners: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+            internal_name: make_record_cleaner(config.fields.values())
+            for internal_name, config in TABLE_CONFIGS.items()
+        }
+
+    def _request(self, method: str, base_id: str, url: str, **kwargs) -> requests.Response:
+        """Send a request to a base, paced by the base's rate limit (writes on write_session)."""
+        limiter = self._limiters.get(base_id)
+        if limiter:
+            limiter.acquire()
+        session = self.session if method == "GET" else self.write_session
+        return session.request(method, url, **kwargs)
+
+    def _load_index(
+        self,
+        base_id: str,
+        table_name: str,
+        key_field: str,
+        max_pages: int
+    ) -> Optional[Dict[str, str]]:
+        """
+        Build a {key value: record ID} index of a table from one paginated list.
+
+        Replaces a filterByFormula query per record with one request per 100
+        records, so it only pays off for small tables.
+
+        Args:
+            base_id: Airtable base ID
+            table_name: Table name
+            key_field: Field to index on
+            max_pages: Give up if the table takes more list requests than this
+
+        Returns:
+            Index dict, or None if the table is larger or could not be listed
+        """
+        if max_pages < 1:
             return None
 
-        return self.bases.get(config.base_type)
+        url = f"{self.base_url}/{base_id}/{table_name}"
+        params = {"fields[]": key_field, "pageSize": 100}
+        index = {}
+
+        try:
+            while True:
+                response = self._request("GET", base_id, url, params=params, timeout=30)
+                response.raise_for_status()
+                page = response.json()
+
+                for record in page.get('records', []):
+                    value = record.get('fields', {}).get(key_field)
+                    if value is not None:
+                        index.setdefault(str(value), record['id'])
+
+                if 'offset' not in page:
+                    break
+                max_pages -= 1
+                if not max_pages:
+                    logger.debug(f"{table_name} too large to index, looking up records one by one")
+                    return None
+                params["offset"] = page['offset']
 
-    def _get_table_name(self, internal_name: str) -> Optional[str]:
-        """Get actual Airtable table name from internal name."""
-        config = get_table_config(internal_name)
-        if not config:
+        except Exception as e:
+            logger.error(f"Error loading index for {table_name}: {e}")
             return None
-        return config.name
+
+        logger.info(f"Indexed {len(index)} records in {table_name} on {key_field}")
+        return index
 
     def _find_record(self, base_id: str, table_name: str, key_field: str, key_value: str) -> Optional[str]:
         """
@@ -62,8 +181,8 @@ class AirtableSync:
         """
         url = f"{self.base_url}/{base_id}/{table_name}"
 
-        # Build filter formula
-        filter_formula = f"{{{key_field}}}='{key_value}'"
+        # Build filter formula (escape the value so quotes can't break out of the string literal)
+        filter_formula = "{" + key_field + "}='" + key_value.translate(_FORMULA_ESCAPE) + "'"
 
         params = {
             "filterByFormula": filter_formula,
@@ -71,7 +190,7 @@ class AirtableSync:
         }
 
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
+            response = self._request("GET", base_id, url, params=params, timeout=10)
             response.raise_for_status()
 
             records = response.json().get('records', [])
@@ -84,45 +203,11 @@ class AirtableSync:
             logger.error(f"Error finding record in {table_name}: {e}")
             return None
 
-    def _clean_record_data(self, record_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Clean record data before sending to Airtable.
-
-        - Remove empty strings (causes issues with singleSelect fields)
-        - Remove None values
-        - Convert "N.v.t" to "N.v.t." for singleSelect fields that require it
-
-        Args:
-            record_data: Raw record data
-
-        Returns:
-            Cleaned record data
-        """
-        # Fields that use "N.v.t." (with period) in Airtable
-        nvt_with_period_fields = {
-            'Locatie',
-            'Cilinder Gelijksluitend',
-            'Brievenbus'
-        }
-
-        cleaned = {}
-        for key, value in record_data.items():
-            # Skip empty strings and None values
-            if value == "" or value is None:
-                continue
-
-            # Convert "N.v.t" to "N.v.t." for specific singleSelect fields
-            if key in nvt_with_period_fields and value == "N.v.t":
-                cleaned[key] = "N.v.t."
-            else:
-                cleaned[key] = value
-
-        return cleaned
-
     def upsert_record(
         self,
         table_internal_name: str,
-        record_data: Dict[str, Any]
+        record_data: Dict[str, Any],
+        index: Optional[Dict[str, str]] = None
     ) -> Optional[str]:
         """
         Upsert a single record to Airtable.
@@ -133,35 +218,39 @@ class AirtableSync:
         Args:
             table_internal_name: Internal table name (e.g., 'klantenportaal')
             record_data: Dictionary of field values
+            index: Complete {key value: record ID} index of the table (from
+                _load_index); without it the record is looked up by query
 
         Returns:
             Record ID if successful, None otherwise
         """
-        config = get_table_config(table_internal_name)
-        if not config:
+        meta = self._table_meta.get(table_internal_name)
+        if not meta:
             logger.error(f"Unknown table: {table_internal_name}")
             return None
 
-        base_id = self._get_base_id(table_internal_name)
-        table_name = config.name
-        key_field = config.key_field
+        base_id, table_name, key_field = meta
 
         # Clean the record data
-        record_data = self._clean_record_data(record_data)
+        record_data = self._cleaners[table_internal_name](record_data)
 
         if not base_id:
             logger.error(f"Could not determine base ID for {table_internal_name}")
             return None
 
-        # Check if key field exists in data
-        if key_field not in record_data:
+        # Check if key field exists in data (cleaning already dropped None/"" values)
+        key_value = record_data.get(key_field)
+        if key_value is None:
             logger.error(f"Record data missing key field '{key_field}' for {table_internal_name}")
             return None
+        if not isinstance(key_value, str):
+            key_value = str(key_value)
 
-        key_value = str(record_data[key_field])
-
-        # Find existing record
-        existing_id = self._find_record(base_id, table_name, key_field, key_value)
+        # Find existing record (caller's index, else a per-record query)
+        if index is not None:
+            existing_id = index.get(key_value)
+        else:
+            existing_id = self._find_record(base_id, table_name, key_field, key_value)
 
         url = f"{self.base_url}/{base_id}/{table_name}"
 
@@ -170,16 +259,18 @@ class AirtableSync:
                 # Update existing record
                 url = f"{url}/{existing_id}"
                 payload = {"fields": record_data}
-                response = requests.patch(url, headers=self.headers, json=payload, timeout=10)
+                response = self._request("PATCH", base_id, url, json=payload, timeout=10)
                 response.raise_for_status()
                 logger.info(f"Updated record in {table_name}: {key_field}={key_value}")
                 return existing_id
             else:
                 # Create new record
                 payload = {"fields": record_data}
-                response = requests.post(url, headers=self.headers, json=payload, timeout=10)
+                response = self._request("POST", base_id, url, json=payload, timeout=10)
                 response.raise_for_status()
                 record_id = response.json().get('id')
+                if index is not None and record_id:
+                    index[key_value] = record_id
                 logger.info(f"Created record in {table_name}: {key_field}={key_value}")
                 return record_id
 
@@ -217,16 +308,15 @@ class AirtableSync:
         Returns:
             Record ID if successful, None otherwise
         """
-        config = get_table_config(table_internal_name)
-        if not config:
+        meta = self._table_meta.get(table_internal_name)
+        if not meta:
             logger.error(f"Unknown table: {table_internal_name}")
             return None
 
-        base_id = self._get_base_id(table_internal_name)
-        table_name = config.name
+        base_id, table_name, _ = meta
 
         # Clean the record data
-        record_data = self._clean_record_data(record_data)
+        record_data = self._cleaners[table_internal_name](record_data)
 
         if not base_id:
             logger.error(f"Could not determine base ID for {table_internal_name}")
@@ -237,7 +327,7 @@ class AirtableSync:
         try:
             # Always create new record
             payload = {"fields": record_data}
-            response = requests.post(url, headers=self.headers, json=payload, timeout=10)
+            response = self._request("POST", base_id, url, json=payload, timeout=10)
             response.raise_for_status()
             record_id = response.json().get('id')
 
@@ -268,47 +358,92 @@ class AirtableSync:
         records: List[Dict[str, Any]]
     ) -> Dict[str, int]:
         """
-        Upsert multiple records to a table.
+        Upsert multiple records to a table, 10 records per request.
 
         For Subproducten: Always creates new records (no upsert check)
-        For other tables: Upserts based on key field
+        For other tables: Upserts based on key field (Airtable performUpsert)
+
+        If Airtable rejects a batch, its records are retried one at a time so a
+        single invalid record does not fail the rest of the batch.
 
         Args:
             table_internal_name: Internal table name
             records: List of record dictionaries
 
         Returns:
-            Dictionary with 'created' and 'updated' counts
+            Dictionary with 'created', 'updated' and 'failed' counts
         """
         stats = {"created": 0, "updated": 0, "failed": 0}
 
+        # {key value: record ID} for the per-record fallback, loaded at most once per call
+        index: Optional[Dict[str, str]] = None
+        index_loaded = False
+
+        base_id, table_name, key_field = self._table_meta.get(table_internal_name, (None, None, None))
+        if not base_id:
+            logger.error(f"Could not determine base ID for {table_internal_name}")
+            stats["failed"] = len(records)
+            return stats
+
+        url = f"{self.base_url}/{base_id}/{table_name}"
+
         # Special handling for Subproducten - always create, never update
         # Multiple subproducts can share the same Element ID Ref
-        if table_internal_name == 'subproducten':
-            for record in records:
-                result = self.create_record(table_internal_name, record)
-                if result:
-                    stats["created"] += 1
+        upsert = table_internal_name != 'subproducten'
+
+        clean = self._cleaners[table_internal_name]
+        cleaned = [clean(record) for record in records]
+        if upsert:
+            keyed = [record for record in cleaned if key_field in record]
+            if len(keyed) < len(cleaned):
+                missing = len(cleaned) - len(keyed)
+                logger.error(f"{missing} records missing key field '{key_field}' for {table_internal_name}")
+                stats["failed"] += missing
+            cleaned = keyed
+
+        for i in range(0, len(cleaned), AIRTABLE_BATCH_SIZE):
+            batch = cleaned[i:i + AIRTABLE_BATCH_SIZE]
+            payload = {"records": [{"fields": record} for record in batch]}
+
+            try:
+                if upsert:
+                    payload["performUpsert"] = {"fieldsToMergeOn": [key_field]}
+                    response = self._request("PATCH", base_id, url, json=payload, timeout=30)
                 else:
-                    stats["failed"] += 1
+                    response = self._request("POST", base_id, url, json=payload, timeout=30)
+                response.raise_for_status()
+                result = response.json()
 
-            logger.info(
-                f"Batch create to {table_internal_name}: "
-                f"{stats['created']} created, {stats['failed']} failed"
-            )
-        else:
-            # Normal upsert logic for other tables
-            for record in records:
-                result = self.upsert_record(table_internal_name, record)
-                if result:
-                    stats["created"] += 1
+                if upsert:
+                    stats["created"] += len(result.get("createdRecords", []))
+                    stats["updated"] += len(result.get("updatedRecords", []))
                 else:
-                    stats["failed"] += 1
-
-            logger.info(
-                f"Batch upsert to {table_internal_name}: "
-                f"{stats['created']} succeeded, {stats['failed']} failed"
-            )
+                    stats["created"] += len(result.get("records", []))
+
+            except requests.exceptions.HTTPError as e:
+                logger.warning(f"Batch write to {table_name} rejected ({e}), retrying records individually")
+                if upsert and not index_loaded:
+                    # A list request returns 100 records: only index the table if that takes
+                    # fewer requests than looking up this batch's records one by one
+                    index = self._load_index(base_id, table_name, key_field, max_pages=len(batch) - 1)
+                    index_loaded = True
+                for record in batch:
+                    if upsert:
+                        record_id = self.upsert_record(table_internal_name, record, index)
+                    else:
+                        record_id = self.create_record(table_internal_name, record)
+                    if record_id:
+                        stats["created"] += 1
+                    else:
+                        stats["failed"] += 1
+            except Exception as e:
+                logger.error(f"Error writing batch to {table_name}: {e}")
+                stats["failed"] += len(batch)
+
+        logger.info(
+            f"Batch {'upsert' if upsert else 'create'} to {table_internal_name}: "
+            f"{stats['created']} created, {stats['updated']} updated, {stats['failed']} failed"
+        )
 
         return stats
 
@@ -316,6 +451,9 @@ class AirtableSync:
         """
         Sync all records from a transformed proposal to Airtable.
 
+        Tables within a stage are independent and sync in parallel threads;
+        each stage finishes before the next one starts.
+
         Args:
             all_records: Dictionary with keys matching table names, values are lists of records
 
@@ -324,28 +462,34 @@ class AirtableSync:
         """
         results = {}
 
-        # Sync in order:
-        # STB-SALES: Klantenportaal -> Elements -> Specs -> Subproducten -> Nacalculatie
-        # STB-ADMINISTRATIE: Inmeetplanning -> Projecten -> Facturatie
-        sync_order = [
-            "klantenportaal",
-            "elementen_overzicht",
-            "hoofdproduct_specificaties",
-            "subproducten",
-            "nacalculatie",
-            "inmeetplanning",
-            "projecten",
-            "facturatie",
-        ]
-
-        for table_name in sync_order:
-            records = all_records.get(table_name, [])
-            if not records:
-                logger.info(f"No records to sync for {table_name}")
-                continue
-
-            logger.info(f"Syncing {len(records)} records to {table_name}...")
-            stats = self.upsert_records(table_name, records)
-            results[table_name] = stats
-
-        return results
+        with ThreadPoolExecutor(max_workers=SYNC_MAX_WORKERS) as executor:
+            for stage in SYNC_STAGES:
+                futures = {}
+                for table_name in stage:
+                    records = all_records.get(table_name, [])
+                    if not records:
+                        logger.info(f"No records to sync for {table_name}")
+                        continue
+
+                    logger.info(f"Syncing {len(records)} records to {table_name}...")
+                    futures[executor.submit(self.upsert_records, table_name, records)] = table_name
+
+                for future in as_completed(futures):
+                    table_name = futures[future]
+                    try:
+                        results[table_name] = future.result()
+                    except Exception as e:
+                        logger.error(f"Error syncing {table_name}: {e}")
+                        results[table_name] = {
+                            "created": 0,
+                            "updated": 0,
+                            "failed": len(all_records[table_name])
+                        }
+
+        # Report tables in sync order, not completion order
+        return {
+            table_name: results[table_name]
+            for stage in SYNC_STAGES
+            for table_name in stage
+            if table_name in results
+        }
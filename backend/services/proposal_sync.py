@@ -4,8 +4,12 @@ Direct proposal sync service - no AI agent needed.
 Handles complete Offorte -> Airtable sync deterministically.
 """
 
+import asyncio
+import orjson
 import requests
-from typing import Dict, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, List, Optional, Tuple
 from urllib.parse import quote
 from loguru import logger
 
@@ -22,6 +26,22 @@ class ProposalSyncService:
         self.offorte_api_key = settings.offorte_api_key
         self.offorte_account = quote(settings.offorte_account_name)
         self.base_url = f"https://connect.offorte.com/api/v2/{self.offorte_account}"
+
+        # One pooled session for all Offorte calls (keep-alive, retry on 429/5xx)
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=20,
+            pool_maxsize=50,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[429, 500, 502, 503, 504],
+                raise_on_status=False  # hand the last response to raise_for_status()
+            )
+        ))
+        # Offorte authenticates with a query parameter; attach it once
+        self.session.params = {"api_key": self.offorte_api_key}
+
         self.airtable_sync = AirtableSync()
 
     def fetch_proposal(self, proposal_id: int) -> Dict[str, Any]:
@@ -38,15 +58,15 @@ class ProposalSyncService:
             Exception if fetch fails
         """
         url = f"{self.base_url}/proposals/{proposal_id}/details"
-        params = {"api_key": self.offorte_api_key}
 
         logger.info(f"Fetching proposal {proposal_id} from Offorte...")
 
         try:
-            response = requests.get(url, params=params, timeout=30)
+            response = self.session.get(url, timeout=30)
             response.raise_for_status()
 
-            proposal_data = response.json()
+            # Decode straight from the response bytes (skips the bytes -> str step)
+            proposal_data = orjson.loads(response.content)
             logger.info(f"Successfully fetched proposal {proposal_id}")
 
             # Log summary
@@ -155,13 +175,24 @@ class ProposalSyncService:
         return result
 
 
-# Global instance
-sync_service = ProposalSyncService()
+# Shared instance, created on first use so importing this module stays cheap
+_sync_service: Optional[ProposalSyncService] = None
+
+
+def get_sync_service() -> ProposalSyncService:
+    """Return the shared sync service, creating it on first call."""
+    global _sync_service
+    if _sync_service is None:
+        _sync_service = ProposalSyncService()
+    return _sync_service
 
 
 async def process_proposal_sync(proposal_id: int, job_id: str = None) -> Dict[str, Any]:
     """
-    Main entry point for proposal sync (async wrapper for compatibility).
+    Main entry point for proposal sync.
+
+    The sync itself uses blocking HTTP calls, so it runs in a worker thread
+    to keep the event loop free for other proposals and requests.
 
     Args:
         proposal_id: Offorte proposal ID
@@ -175,4 +206,42 @@ async def process_proposal_sync(proposal_id: int, job_id: str = None) -> Dict[st
     else:
         logger.info(f"Processing proposal {proposal_id}")
 
-    return sync_service.sync_proposal(proposal_id)
+    return await asyncio.to_thread(get_sync_service().sync_proposal, proposal_id)
+
+
+async def process_proposals_sync(
+    pairs: List[Tuple[int, Optional[str]]],
+    max_concurrency: int = 8
+) -> List[Dict[str, Any]]:
+    """
+    Batch entry point: sync several proposals concurrently (e.g. for backfills).
+
+    All proposals share the service from get_sync_service(). Each sync runs in a worker
+    thread because the Offorte and Airtable calls are blocking.
+
+    Args:
+        pairs: (proposal_id, job_id) tuples
+        max_concurrency: Maximum number of proposals syncing at once
+
+    Returns:
+        Sync result dictionaries, in the same order as pairs
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def sync_one(proposal_id: int, job_id: Optional[str]) -> Dict[str, Any]:
+        async with semaphore:
+            return await process_proposal_sync(proposal_id, job_id)
+
+    logger.info(f"Processing batch of {len(pairs)} proposals (max {max_concurrency} concurrent)")
+
+    results = await asyncio.gather(
+        *(sync_one(proposal_id, job_id) for proposal_id, job_id in pairs),
+        return_exceptions=True
+    )
+
+    # Keep one result per proposal, even if a sync raised
+    return [
+        {"success": False, "proposal_id": proposal_id, "errors": [f"Unexpected error during sync: {result}"]}
+        if isinstance(result, Exception) else result
+        for (proposal_id, _), result in zip(pairs, results)
+    ]
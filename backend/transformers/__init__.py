@@ -1,9 +1,6 @@
 """Transformation modules for Offorte to Airtable sync."""
 
-from .offorte_to_airtable import (
-    transform_proposal_to_all_records,
-    transform_proposal_to_klantenportaal,
-)
+from importlib import import_module
 
 from .specs_parser import (
     extract_specs_from_pricetable,
@@ -12,6 +9,13 @@ from .specs_parser import (
     extract_product_name_clean
 )
 
+# Loaded on first access (PEP 562): offorte_to_airtable pulls in the LLM
+# extractor (OpenAI/httpx), which importers of specs_parser don't need
+_LAZY_EXPORTS = {
+    'transform_proposal_to_all_records': '.offorte_to_airtable',
+    'transform_proposal_to_klantenportaal': '.offorte_to_airtable',
+}
+
 __all__ = [
     'transform_proposal_to_all_records',
     'transform_proposal_to_klantenportaal',
@@ -20,3 +24,12 @@ __all__ = [
     'extract_dimensions_from_text',
     'extract_product_name_clean'
 ]
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
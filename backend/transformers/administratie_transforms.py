@@ -4,12 +4,99 @@ Transformation functions for STB-ADMINISTRATIE tables.
 These functions transform Offorte proposals to Inmeetplanning, Projecten, and Facturatie records.
 """
 
-from typing import Dict, Any, List
+import re
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
 from backend.transformers.specs_parser import extract_product_name_clean
 
 
+@dataclass(slots=True, frozen=True)
+class _Customer:
+    """Customer fields shared by the STB-ADMINISTRATIE records."""
+    name: str
+    street: str
+    zipcode: str
+    city: str
+    state: str
+    phone: str
+    email: str
+
+    @property
+    def full_address(self) -> str:
+        """Street, zipcode and city, or just the street if any part is missing."""
+        if self.street and self.zipcode and self.city:
+            return f"{self.street}, {self.zipcode} {self.city}"
+        return self.street
+
+
+# Customer name fields, in order of preference
+_NAME_KEYS = ('company_name', 'name', 'fullname')
+
+
+def _extract_customer(proposal_data: Dict[str, Any]) -> _Customer:
+    """Read customer info from a webhook payload (contact) or API response (customer)."""
+    customer = proposal_data.get('customer') or proposal_data.get('contact', {})
+    return _Customer(
+        name=next((value for key in _NAME_KEYS if (value := customer.get(key))), ''),
+        street=customer.get('street', ''),
+        zipcode=customer.get('zipcode', ''),
+        city=customer.get('city', ''),
+        state=customer.get('state', ''),
+        phone=customer.get('phone', ''),
+        email=customer.get('email', ''),
+    )
+
+
+def _get_pricetables(proposal_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Pricetables from a webhook payload (content.pricetables) or API response (pricetables)."""
+    content = proposal_data.get('content', {})
+    return content.get('pricetables', []) if content else proposal_data.get('pricetables', [])
+
+
+# Element types that take longer to measure
+_DOOR_RE = re.compile(r'deur', re.IGNORECASE)
+
+# Locatie keywords for floors that need a ladder when measuring
+_UPPER_FLOOR_RE = re.compile(r'eerste verdieping|tweede verdieping|zolder', re.IGNORECASE)
+
+# STB payment schedule: (Factuur ID suffix, Type Factuur, share of total, title)
+_INVOICE_SCHEDULE = (
+    ("F1", "30% Vooraf", 0.30, "Vooruitbetaling 30%"),
+    ("F2", "65% Bij Start", 0.65, "Start Opdracht 65%"),
+    ("F3", "5% Oplevering", 0.05, "Eindafrekening 5%"),
+)
+
+
+def _get_total_incl(proposal_data: Dict[str, Any]) -> float:
+    """Proposal total including BTW."""
+    return float(proposal_data.get('price_total_original', 0) or 0)
+
+
+@dataclass(slots=True, frozen=True)
+class _ProposalInfo:
+    """Proposal values shared by the Inmeetplanning, Projecten and Facturatie records."""
+    proposal_id: str
+    customer: _Customer
+    full_address: str
+    total_incl: float
+    won_at: Optional[str]
+    pricetables: List[Dict[str, Any]]
+
+
+def _extract_proposal_info(proposal_data: Dict[str, Any]) -> _ProposalInfo:
+    """Read the shared proposal values once."""
+    customer = _extract_customer(proposal_data)
+    return _ProposalInfo(
+        proposal_id=str(proposal_data.get('id', '')),
+        customer=customer,
+        full_address=customer.full_address,
+        total_incl=_get_total_incl(proposal_data),
+        won_at=proposal_data.get('won_at'),
+        pricetables=_get_pricetables(proposal_data),
+    )
+
+
 def transform_proposal_to_inmeetplanning(
     proposal_data: Dict[str, Any],
     elementen_overzicht: List[Dict[str, Any]] = None,
@@ -28,53 +115,57 @@ def transform_proposal_to_inmeetplanning(
     Returns:
         Inmeetplanning record dict
     """
-    proposal_id = str(proposal_data.get('id', ''))
+    return _build_inmeetplanning(_extract_proposal_info(proposal_data), elementen_overzicht, hoofdproduct_specs)
 
-    # Customer info
-    customer = proposal_data.get('customer') or proposal_data.get('contact', {})
-    customer_name = customer.get('company_name', '') or customer.get('name', '') or customer.get('fullname', '')
-
-    # Address
-    street = customer.get('street', '')
-    zipcode = customer.get('zipcode', '')
-    city = customer.get('city', '')
-    state = customer.get('state', '')
 
-    # Pricing
-    won_at = proposal_data.get('won_at')
-    total_incl = float(proposal_data.get('price_total_original', 0) or 0)
+def _build_inmeetplanning(
+    info: _ProposalInfo,
+    elementen_overzicht: Optional[List[Dict[str, Any]]],
+    hoofdproduct_specs: Optional[List[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """Build the Inmeetplanning record from the shared proposal values."""
+    customer = info.customer
 
     # Count elements
     if elementen_overzicht:
         num_elements = len(elementen_overzicht)
     else:
-        content = proposal_data.get('content', {})
-        pricetables = content.get('pricetables', []) if content else proposal_data.get('pricetables', [])
-        num_elements = len(pricetables)
+        num_elements = len(info.pricetables)
+
+    # One pass over the specs: unique locaties and whether any is on an upper floor
+    has_upper_floor = False
+    locaties_text = ""
+    if hoofdproduct_specs:
+        unique_locaties = set()
+        for spec in hoofdproduct_specs:
+            locatie = (spec.get('Locatie') or '').strip()
+            if not has_upper_floor and _UPPER_FLOOR_RE.search(locatie):
+                has_upper_floor = True
+            if locatie and locatie.lower() != 'n.v.t':
+                unique_locaties.add(locatie)
+
+        if unique_locaties:
+            locaties_text = "\n".join(sorted(unique_locaties))
 
     # Calculate estimated hours for measurement
     # Base: 15 minutes per element (middle of 10-20 range)
     # Add extra time for doors (more complex) and upper floors
-    estimated_minutes = 0
-    has_upper_floor = False
-
+    # The same pass builds the elements overview (list of all element names)
+    elementen_overview_text = ""
     if elementen_overzicht:
-        for element in elementen_overzicht:
+        estimated_minutes = 0
+        element_lines = []
+        for i, element in enumerate(elementen_overzicht, 1):
             element_type = element.get('Hoofdproduct Type', '')
 
             # Base time per element
-            if 'deur' in element_type.lower():
+            if element_type and _DOOR_RE.search(element_type):
                 estimated_minutes += 20  # Doors take longer
             else:
                 estimated_minutes += 15  # Windows average time
 
-        # Check for upper floors in locaties
-        if hoofdproduct_specs:
-            for spec in hoofdproduct_specs:
-                locatie = spec.get('Locatie', '').lower()
-                if any(floor in locatie for floor in ['eerste verdieping', 'tweede verdieping', 'zolder']):
-                    has_upper_floor = True
-                    break
+            element_lines.append(f"{i}. {element.get('Hoofdproduct Naam', 'Element')} ({element_type})")
+        elementen_overview_text = "\n".join(element_lines)
 
         # Add 20% extra time if there are upper floors (ladder needed)
         if has_upper_floor:
@@ -88,40 +179,18 @@ def transform_proposal_to_inmeetplanning(
     # Round to nearest 0.5 (e.g., 1.2 -> 1.0, 1.3 -> 1.5, 1.8 -> 2.0)
     estimated_hours = round(estimated_hours * 2) / 2
 
-    # Create elements overview (list of all element names)
-    elementen_overview_text = ""
-    if elementen_overzicht:
-        element_lines = []
-        for i, elem in enumerate(elementen_overzicht, 1):
-            naam = elem.get('Hoofdproduct Naam', 'Element')
-            element_type = elem.get('Hoofdproduct Type', '')
-            element_lines.append(f"{i}. {naam} ({element_type})")
-        elementen_overview_text = "\n".join(element_lines)
-
-    # Extract unique locaties
-    locaties_text = ""
-    if hoofdproduct_specs:
-        unique_locaties = set()
-        for spec in hoofdproduct_specs:
-            locatie = spec.get('Locatie', '').strip()
-            if locatie and locatie.lower() != 'n.v.t':
-                unique_locaties.add(locatie)
-
-        if unique_locaties:
-            locaties_text = "\n".join(sorted(unique_locaties))
-
     return {
-        "Opdrachtnummer": proposal_id,
-        "Klantnaam": customer_name,
-        "Klant & Stad": f"{customer_name}, {city}" if city else customer_name,
-        "Telefoon": customer.get('phone', ''),
-        "E-mail": customer.get('email', ''),
-        "Volledig Adres": street,
-        "Postcode": zipcode,
-        "Stad": city,
-        "Provincie": state,
-        "Opdracht verkocht op": won_at.split('T')[0] if won_at else None,
-        "Total Amount Incl BTW": total_incl,
+        "Opdrachtnummer": info.proposal_id,
+        "Klantnaam": customer.name,
+        "Klant & Stad": f"{customer.name}, {customer.city}" if customer.city else customer.name,
+        "Telefoon": customer.phone,
+        "E-mail": customer.email,
+        "Volledig Adres": customer.street,
+        "Postcode": customer.zipcode,
+        "Stad": customer.city,
+        "Provincie": customer.state,
+        "Opdracht verkocht op": info.won_at.split('T')[0] if info.won_at else None,
+        "Total Amount Incl BTW": info.total_incl,
         "Aantal Elementen": num_elements,
         "Elementen": num_elements,  # Number field (not text)
         "Elementen Overzicht": elementen_overview_text if elementen_overview_text else None,
@@ -144,27 +213,20 @@ def transform_proposal_to_project(proposal_data: Dict[str, Any]) -> Dict[str, An
     Returns:
         Project record dict
     """
-    proposal_id = str(proposal_data.get('id', ''))
-
-    # Customer info
-    customer = proposal_data.get('customer') or proposal_data.get('contact', {})
-    customer_name = customer.get('company_name', '') or customer.get('name', '') or customer.get('fullname', '')
+    return _build_project(_extract_proposal_info(proposal_data))
 
-    # Address
-    street = customer.get('street', '')
-    zipcode = customer.get('zipcode', '')
-    city = customer.get('city', '')
 
-    full_address = f"{street}, {zipcode} {city}" if all([street, zipcode, city]) else street
+def _build_project(info: _ProposalInfo) -> Dict[str, Any]:
+    """Build the Project record from the shared proposal values."""
+    customer = info.customer
 
     # Pricing
-    total_incl = float(proposal_data.get('price_total_original', 0) or 0)
+    total_incl = info.total_incl
     # Estimate excl BTW (rough calculation, actual is in elements)
     total_excl = total_incl / 1.21 if total_incl else 0
 
     # Count elements
-    content = proposal_data.get('content', {})
-    pricetables = content.get('pricetables', []) if content else proposal_data.get('pricetables', [])
+    pricetables = info.pricetables
     num_elements = len(pricetables)
 
     # Create summary (first 5 elements) - extract clean product names
@@ -183,14 +245,14 @@ def transform_proposal_to_project(proposal_data: Dict[str, Any]) -> Dict[str, An
         elements_summary += f" (+{len(pricetables) - 5} meer)"
 
     return {
-        "Opdrachtnummer": proposal_id,
-        "Klantnaam": customer_name,
+        "Opdrachtnummer": info.proposal_id,
+        "Klantnaam": customer.name,
         "Project Status": "Verkocht",  # Valid: Verkocht, Facturatie, Inmeet Planning, Inmeet Voltooid, In Productie, Voltooid
-        "Volledig Adres": full_address,
-        "Postcode": zipcode,
-        "Stad": city,
-        "Telefoon": customer.get('phone', ''),
-        "Email": customer.get('email', ''),
+        "Volledig Adres": info.full_address,
+        "Postcode": customer.zipcode,
+        "Stad": customer.city,
+        "Telefoon": customer.phone,
+        "Email": customer.email,
         "Totaal Verkoopprijs Excl BTW": round(total_excl, 2),
         "Totaal Verkoopprijs Incl BTW": total_incl,
         "Aantal Elementen": num_elements,
@@ -214,64 +276,58 @@ def transform_proposal_to_facturatie(proposal_data: Dict[str, Any]) -> List[Dict
     Returns:
         List of 3 Facturatie records
     """
-    proposal_id = str(proposal_data.get('id', ''))
+    return _build_facturatie(_extract_proposal_info(proposal_data))
 
-    # Customer info
-    customer = proposal_data.get('customer') or proposal_data.get('contact', {})
-    customer_name = customer.get('company_name', '') or customer.get('name', '') or customer.get('fullname', '')
 
-    # Address
-    street = customer.get('street', '')
-    zipcode = customer.get('zipcode', '')
-    city = customer.get('city', '')
-    full_address = f"{street}, {zipcode} {city}" if all([street, zipcode, city]) else street
+def _build_facturatie(info: _ProposalInfo) -> List[Dict[str, Any]]:
+    """Build the Facturatie records from the shared proposal values."""
+    proposal_id = info.proposal_id
+    customer = info.customer
 
-    # Pricing
-    total_incl = float(proposal_data.get('price_total_original', 0) or 0)
+    # Final invoice takes the remainder so the amounts add up to the total exactly
+    amounts = [round(info.total_incl * share, 2) for _, _, share, _ in _INVOICE_SCHEDULE[:-1]]
+    amounts.append(round(info.total_incl - sum(amounts), 2))
 
     # Create 3 invoices based on payment schedule
-    invoices = []
-
-    # 1. 30% Vooraf
-    invoices.append({
-        "Factuur ID": f"{proposal_id}-F1",
-        "Opdrachtnummer": proposal_id,
-        "Type Factuur": "30% Vooraf",
-        "Bedrag": round(total_incl * 0.30, 2),
-        "Status": "Concept",  # Valid: Concept, Verstuurd, Betaald, Herinnering, Achterstallig
-        "Klant": customer_name,
-        "Email": customer.get('email', ''),
-        "Telefoon": customer.get('phone', ''),
-        "Adres": full_address,
-        "Factuurtitel": f"Vooruitbetaling 30% - Opdracht {proposal_id}",
-    })
-
-    # 2. 65% Bij Start
-    invoices.append({
-        "Factuur ID": f"{proposal_id}-F2",
-        "Opdrachtnummer": proposal_id,
-        "Type Factuur": "65% Bij Start",
-        "Bedrag": round(total_incl * 0.65, 2),
-        "Status": "Concept",
-        "Klant": customer_name,
-        "Email": customer.get('email', ''),
-        "Telefoon": customer.get('phone', ''),
-        "Adres": full_address,
-        "Factuurtitel": f"Start Opdracht 65% - Opdracht {proposal_id}",
-    })
-
-    # 3. 5% Oplevering
-    invoices.append({
-        "Factuur ID": f"{proposal_id}-F3",
-        "Opdrachtnummer": proposal_id,
-        "Type Factuur": "5% Oplevering",
-        "Bedrag": round(total_incl * 0.05, 2),
-        "Status": "Concept",
-        "Klant": customer_name,
-        "Email": customer.get('email', ''),
-        "Telefoon": customer.get('phone', ''),
-        "Adres": full_address,
-        "Factuurtitel": f"Eindafrekening 5% - Opdracht {proposal_id}",
-    })
-
-    return invoices
+    return [
+        {
+            "Factuur ID": f"{proposal_id}-{suffix}",
+            "Opdrachtnummer": proposal_id,
+            "Type Factuur": invoice_type,
+            "Bedrag": amount,
+            "Status": "Concept",  # Valid: Concept, Verstuurd, Betaald, Herinnering, Achterstallig
+            "Klant": customer.name,
+            "Email": customer.email,
+            "Telefoon": customer.phone,
+            "Adres": info.full_address,
+            "Factuurtitel": f"{title} - Opdracht {proposal_id}",
+        }
+        for (suffix, invoice_type, _, title), amount in zip(_INVOICE_SCHEDULE, amounts)
+    ]
+
+
+def transform_proposal_to_administratie(
+    proposal_data: Dict[str, Any],
+    elementen_overzicht: List[Dict[str, Any]] = None,
+    hoofdproduct_specs: List[Dict[str, Any]] = None
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Transform proposal to all STB-ADMINISTRATIE records in one pass.
+
+    Customer, address and pricing are read once and shared by the three
+    record builders.
+
+    Args:
+        proposal_data: Complete proposal from Offorte
+        elementen_overzicht: List of element records (optional, for better data)
+        hoofdproduct_specs: List of hoofdproduct specificaties (optional, for locaties)
+
+    Returns:
+        Dictionary with keys: inmeetplanning, projecten, facturatie - each containing list of records
+    """
+    info = _extract_proposal_info(proposal_data)
+    return {
+        "inmeetplanning": [_build_inmeetplanning(info, elementen_overzicht, hoofdproduct_specs)],
+        "projecten": [_build_project(info)],
+        "facturatie": _build_facturatie(info),
+    }
@@ -5,26 +5,116 @@ Uses OpenAI GPT-4 to extract structured specs from HTML content with high accura
 Handles variations in HTML structure, Dutch language, and product-specific fields.
 """
 
-import json
-from typing import Dict, Any, Optional
-from bs4 import BeautifulSoup
-import openai
+import importlib.util
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+import orjson
 from loguru import logger
 
 from backend.core.settings import settings
+from backend.core.spec_cache import SpecCache
+from backend.transformers.llm_spec_prompt import (
+    LLM_PROMPT_VERSION,
+    SPEC_TOOL,
+    BATCH_SPEC_TOOL,
+    SYSTEM_MESSAGE,
+    BATCH_SYSTEM_MESSAGE,
+    html_to_lines,
+    build_product_text,
+)
+from backend.transformers.specs_parser import extract_dimensions_from_text
+
+# Pricetables packed into one LLM request (bounds the size of the structured output)
+LLM_BATCH_SIZE = 8
+
+# Output token budget per product: a full spec object is ~300-500 tokens, the cap
+# stops a runaway generation (e.g. an endless extra_opties list) from holding a request open
+LLM_MAX_OUTPUT_TOKENS_PER_PRODUCT = 800
+
+# Concurrent LLM requests across all proposals being synced (the extractor's
+# shared pool keeps parallel syncs within the provider's rate limits)
+LLM_MAX_CONCURRENCY = 8
+
+# Recent extractions kept in process memory, in front of the on-disk cache
+LLM_MEMORY_CACHE_SIZE = 512
+
+# HTML tags, stripped for the cheap "is there any text at all" check
+_TAG_RE = re.compile(r'<[^>]*>')
+
+# Any letter or digit; text without one (only &nbsp;, dashes, bullets) has nothing to extract
+_ALNUM_RE = re.compile(r'[^\W_]')
+
+# "gelijksluitend(e)", with a preceding "niet"/"geen" captured so negations can be told apart
+_GELIJKSLUITEND_RE = re.compile(r'\b(?:(niet|geen)[\s-]+)?gelijksluitend', re.IGNORECASE)
+
+@dataclass(slots=True)
+class _Extraction:
+    """One pricetable's LLM extraction: its prompt inputs, and the specs once known."""
+    specs: Optional[Dict[str, Any]] = None
+    product_text: str = ""
+    known_fields: Dict[str, Any] = field(default_factory=dict)
+    cache_key: str = ""
+
+
+def _log_prompt_usage(response: Any) -> None:
+    """Log prompt tokens and how many were served from the provider's prompt cache."""
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached_tokens = getattr(details, 'cached_tokens', None) or 0
+    logger.debug(f"LLM prompt tokens: {usage.prompt_tokens} ({cached_tokens} cached)")
 
 
 class LLMSpecExtractor:
-    """Extract specs from Offorte pricetables using LLM."""
+    """
+    Extract specs from Offorte pricetables using LLM.
+
+    extract_specs_from_pricetable is thread-safe: all threads share one
+    OpenAI client and its pooled keep-alive connections. Batched requests
+    run on one shared thread pool, so concurrent proposal syncs together
+    never have more than LLM_MAX_CONCURRENCY requests in flight.
+    """
 
     def __init__(self):
         """Initialize LLM extractor with OpenAI client."""
+        # Imported on first use so importing the transformers doesn't load the OpenAI SDK
+        import httpx
+        import openai
+
+        self.http_client = httpx.Client(
+            # HTTP/2 needs the h2 package (httpx[http2]); HTTP/1.1 without it
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            timeout=httpx.Timeout(60.0, connect=10.0)
+        )
         self.client = openai.OpenAI(
             api_key=settings.llm_api_key,
-            base_url=settings.llm_base_url
+            base_url=settings.llm_base_url,
+            http_client=self.http_client
         )
         self.model = settings.llm_model
 
+        # Shared by every extract_specs_from_pricetables call (caps total in-flight requests)
+        self.executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm-spec")
+
+        # Most recent extractions by cache key (LRU, also used when the disk cache is off)
+        self._recent: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._recent_lock = threading.Lock()
+
+        # Content-addressed cache of extractions (disabled if no cache dir is set)
+        self.cache = None
+        if settings.llm_cache_dir:
+            try:
+                self.cache = SpecCache(settings.llm_cache_dir)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"LLM spec cache disabled: {e}")
+
     def extract_specs_from_pricetable(
         self,
         pricetable: Dict[str, Any],
@@ -40,10 +130,76 @@ class LLMSpecExtractor:
         Returns:
             Dict with extracted specs matching Airtable field names
         """
+        extraction = self._prepare_extraction(pricetable, element_type)
+        if extraction.specs is None:
+            self._extract_single(extraction)
+        return extraction.specs
+
+    def extract_specs_from_pricetables(
+        self,
+        pricetables: List[Dict[str, Any]],
+        element_types: List[Optional[str]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract specs for several pricetables, packing them into shared LLM requests.
+
+        Pricetables that need the LLM (not empty, not cached) are sent up to
+        LLM_BATCH_SIZE per request, identical pricetables only once, so the system message and tool schema are
+        paid once per batch instead of once per element. Batches run
+        concurrently on the extractor's shared pool. A result that does not match its
+        PRODUCT number falls back to its own request.
+
+        Args:
+            pricetables: Pricetable dicts with 'rows' lists
+            element_types: Element type hint per pricetable (same order)
+
+        Returns:
+            Extracted specs per pricetable, in the same order as pricetables
+        """
+        extractions = [
+            self._prepare_extraction(pricetable, element_type)
+            for pricetable, element_type in zip(pricetables, element_types)
+        ]
+
+        # Proposals often repeat a pricetable (e.g. the same hordeur); extract it once
+        pending: Dict[str, _Extraction] = {}
+        duplicates = []
+        for extraction in extractions:
+            if extraction.specs is not None:
+                continue
+            first = pending.setdefault(extraction.cache_key, extraction)
+            if first is not extraction:
+                duplicates.append((extraction, first))
+
+        unique = list(pending.values())
+        batches = [unique[i:i + LLM_BATCH_SIZE] for i in range(0, len(unique), LLM_BATCH_SIZE)]
+
+        if len(batches) <= 1:
+            for batch in batches:
+                self._extract_batch(batch)
+        else:
+            list(self.executor.map(self._extract_batch, batches))
+
+        for extraction, first in duplicates:
+            extraction.specs = dict(first.specs)
+
+        return [extraction.specs for extraction in extractions]
+
+    def _prepare_extraction(
+        self,
+        pricetable: Dict[str, Any],
+        element_type: Optional[str]
+    ) -> _Extraction:
+        """
+        Read a pricetable into the LLM prompt inputs.
+
+        The returned extraction already has its specs set if no LLM call is
+        needed (empty pricetable, no visible text, or a cache hit).
+        """
         rows = pricetable.get('rows', [])
         if not rows:
             logger.warning("Empty pricetable, no specs to extract")
-            return {}
+            return _Extraction(specs={})
 
         # Collect all HTML content from pricetable
         main_row = rows[0]
@@ -56,13 +212,45 @@ class LLMSpecExtractor:
             if content:
                 subproduct_html.append(content)
 
+        # Draft proposals can have rows without any visible text; don't send those to the LLM
+        if not any(
+            _TAG_RE.sub('', html).strip()
+            for html in (main_html, *subproduct_html)
+        ):
+            logger.debug("Skipping pricetable without visible text")
+            return _Extraction(specs={})
+
+        cache_key = SpecCache.make_key(
+            str(LLM_PROMPT_VERSION), self.model, str(element_type), main_html, *subproduct_html
+        )
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info(f"LLM spec cache hit ({len(cached)} spec fields)")
+            return _Extraction(specs=cached)
+        logger.info("LLM spec cache miss")
+
         # Convert HTML to readable text for LLM
-        main_text = self._html_to_text(main_html)
-        subproduct_text = "\n".join([self._html_to_text(html) for html in subproduct_html])
+        main_text = "\n".join(html_to_lines(main_html))
+        subproduct_text = "\n".join(
+            line for html in subproduct_html for line in html_to_lines(html)
+        )
 
-        # Build prompt
-        prompt = self._build_extraction_prompt(main_text, subproduct_text, element_type)
+        # Boilerplate-only rows (e.g. just &nbsp; or "-") pass the tag check above but give the LLM nothing
+        if not (_ALNUM_RE.search(main_text) or _ALNUM_RE.search(subproduct_text)):
+            logger.debug("Skipping LLM, pricetable has no extractable content")
+            return _Extraction(specs={})
 
+        # Fields a regex gets right are given to the LLM as known, and win over its output
+        known_fields = self._pre_extract(main_text, subproduct_text)
+
+        return _Extraction(
+            product_text=build_product_text(main_text, subproduct_text, element_type, known_fields),
+            known_fields=known_fields,
+            cache_key=cache_key
+        )
+
+    def _extract_single(self, extraction: _Extraction) -> None:
+        """Extract one pricetable with its own LLM request (sets extraction.specs)."""
         try:
             # Call OpenAI API
             response = self.client.chat.completions.create(
@@ -70,123 +258,173 @@ class LLMSpecExtractor:
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are an expert at extracting structured data from Dutch construction proposals. Extract specs accurately and return valid JSON only."
+                        "content": SYSTEM_MESSAGE
                     },
                     {
                         "role": "user",
-                        "content": prompt
+                        "content": f"Extract specs from this Dutch construction product description.\n\n"
+                                   f"{extraction.product_text}"
                     }
                 ],
                 temperature=0,  # Deterministic output
-                response_format={"type": "json_object"}
+                max_tokens=LLM_MAX_OUTPUT_TOKENS_PER_PRODUCT,
+                tools=[SPEC_TOOL],
+                tool_choice={"type": "function", "function": {"name": "extract_specs"}}
             )
 
-            # Parse response
-            content = response.choices[0].message.content
-            specs = json.loads(content)
-
-            logger.info(f"LLM extracted {len(specs)} spec fields")
-            logger.debug(f"Extracted specs: {specs}")
+            _log_prompt_usage(response)
 
-            return specs
+            # Parse the forced extract_specs call
+            arguments = response.choices[0].message.tool_calls[0].function.arguments
+            self._finish_extraction(extraction, orjson.loads(arguments))
 
         except Exception as e:
             logger.error(f"LLM extraction failed: {e}")
-            return {}
-
-    def _html_to_text(self, html: str) -> str:
-        """Convert HTML to clean readable text."""
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # Get text but preserve structure
-        lines = []
-        for element in soup.find_all(['p', 'li', 'em']):
-            text = element.get_text(strip=True)
-            if text:
-                lines.append(text)
-
-        return '\n'.join(lines) if lines else soup.get_text(strip=True)
-
-    def _build_extraction_prompt(
-        self,
-        main_text: str,
-        subproduct_text: str,
-        element_type: Optional[str]
-    ) -> str:
-        """Build prompt for LLM spec extraction."""
-
-        type_hint = f"\n\nHint: This is a {element_type} product." if element_type else ""
-
-        return f"""Extract specs from this Dutch construction product description.
-
-MAIN PRODUCT:
-{main_text}
+            extraction.specs = extraction.known_fields
 
-SUBPRODUCTS (colors, glass, hardware, options):
-{subproduct_text}
-{type_hint}
+    def _extract_batch(self, batch: List[_Extraction]) -> None:
+        """Extract several pricetables with one LLM request (sets each extraction.specs)."""
+        if len(batch) == 1:
+            self._extract_single(batch[0])
+            return
 
-Extract the following fields (return JSON). Use "N.v.t" if a field is not mentioned or not applicable:
+        products = "\n\n".join(
+            f"PRODUCT {i}:\n{extraction.product_text}"
+            for i, extraction in enumerate(batch, 1)
+        )
 
-{{
-  "product_name": "Clean product name without dimensions",
-  "geoffreerde_afmetingen": "Full dimension string like '2450x1760 mm' or 'N.v.t'",
-  "breedte": numeric width in mm or null,
-  "hoogte": numeric height in mm or null,
-  "locatie": "Location/placement description. Look for: Floor + position (e.g. 'begane grond voorgevel', 'eerste verdieping achtergevel', 'begane grond zijgevel'), room names (e.g. 'Slaapkamer', 'Woonkamer', 'Zolder'), or 'Plaats:' text. Use 'N.v.t' only if truly not mentioned.",
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": BATCH_SYSTEM_MESSAGE
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Extract specs from each of these {len(batch)} Dutch construction "
+                                   f"product descriptions.\n\n{products}"
+                    }
+                ],
+                temperature=0,  # Deterministic output
+                max_tokens=LLM_MAX_OUTPUT_TOKENS_PER_PRODUCT * len(batch),
+                tools=[BATCH_SPEC_TOOL],
+                tool_choice={"type": "function", "function": {"name": "extract_specs_batch"}}
+            )
 
-  "glas_type": "One of: Triple, HR++, HR+++, Veiligheidsglas, Dubbelglas, Anders, or 'N.v.t'",
+            _log_prompt_usage(response)
 
-  "kleur_kozijn_binnen": "Inside frame color (RAL code or description) or 'N.v.t'",
-  "kleur_vleugel_binnen": "Inside sash/wing color (RAL code or description) or 'N.v.t'",
-  "kleur_kozijn_buiten": "Outside frame color (RAL code or description) or 'N.v.t'",
-  "kleur_vleugel_buiten": "Outside sash/wing color (RAL code or description) or 'N.v.t'",
-  "kleur_binnenafwerking": "Interior finish color or type or 'N.v.t'",
-  "kleur_afstandhouders": "Spacer color - ONLY use 'Aluminium' or 'Zwart'. Default is 'Aluminium' unless specifically mentioned as 'Zwart' or 'N.v.t'",
+            arguments = response.choices[0].message.tool_calls[0].function.arguments
+            results = orjson.loads(arguments)["results"]
+            if not isinstance(results, list):
+                raise ValueError(f"expected a results list, got {type(results).__name__}")
+            if len(results) != len(batch):
+                raise ValueError(f"expected {len(batch)} results, got {len(results)}")
 
-  "model_deurpaneel": "Door panel model name or type (e.g. 'Paneeldeur', 'Vlakke deur') or 'N.v.t'",
-  "type_profiel_kozijn": "Frame/profile type (e.g. 'Kunststof', 'Aluminium', 'Hout', 'Verdiept kunststof') or 'N.v.t'",
+            # An entry that isn't a spec object for its own PRODUCT is extracted again on its own
+            # (a reordered response must not give one pricetable, or its cache key, another's specs)
+            results = [
+                specs if isinstance(specs, dict) and specs.pop('product', None) == i else None
+                for i, specs in enumerate(results, 1)
+            ]
 
-  "draairichting": "Links, Rechts, or 'N.v.t' (for doors, from inside view)",
+        except Exception as e:
+            logger.warning(f"Batched LLM extraction failed ({e}), extracting {len(batch)} products one by one")
+            for extraction in batch:
+                self._extract_single(extraction)
+            return
+
+        invalid = results.count(None)
+        if invalid:
+            logger.warning(f"{invalid} of {len(batch)} batched LLM results invalid or out of order, extracting those one by one")
+        logger.info(f"LLM extracted specs for {len(batch) - invalid} products in one request")
+        for extraction, specs in zip(batch, results):
+            if specs is None:
+                self._extract_single(extraction)
+            else:
+                self._finish_extraction(extraction, specs)
+
+    def _finish_extraction(self, extraction: _Extraction, specs: Dict[str, Any]) -> None:
+        """Apply the regex-extracted fields to the LLM output and cache it."""
+        specs.update(extraction.known_fields)
+
+        logger.info(f"LLM extracted {len(specs)} spec fields")
+        logger.opt(lazy=True).debug("Extracted specs: {}", lambda: orjson.dumps(specs).decode())
+
+        self._cache_set(extraction.cache_key, specs)
+
+        extraction.specs = specs
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up specs in memory, then on disk. Returns a copy the caller may change."""
+        with self._recent_lock:
+            specs = self._recent.get(key)
+            if specs is not None:
+                self._recent.move_to_end(key)
+
+        if specs is None and self.cache:
+            specs = self.cache.get(key)
+            if specs is not None:
+                self._remember(key, specs)
+
+        return dict(specs) if specs is not None else None
+
+    def _cache_set(self, key: str, specs: Dict[str, Any]) -> None:
+        """Store specs in memory and on disk."""
+        self._remember(key, dict(specs))
+        if self.cache:
+            self.cache.set(key, specs)
+
+    def _remember(self, key: str, specs: Dict[str, Any]) -> None:
+        """Add specs to the in-memory LRU, evicting the least recently used entry."""
+        with self._recent_lock:
+            self._recent[key] = specs
+            self._recent.move_to_end(key)
+            if len(self._recent) > LLM_MEMORY_CACHE_SIZE:
+                self._recent.popitem(last=False)
+
+    def _pre_extract(self, main_text: str, subproduct_text: str) -> Dict[str, Any]:
+        """
+        Extract the fields that a regex finds reliably, before calling the LLM.
 
-  "kleur_deurbeslag_binnen": "Color of inside door hardware or 'N.v.t'",
-  "kleur_deurbeslag_buiten": "Color of outside door hardware or 'N.v.t'",
-  "soort_staafgreep": "Bar handle type/specs (e.g. 'RVS P45 30x600mm') or 'N.v.t'",
-  "kleur_scharnieren": "Hinge color or 'N.v.t'",
-  "type_cilinder": "Cylinder type (e.g. 'Gelijksluitende cilinders') or 'N.v.t'",
-  "cilinder_gelijksluitend": "Ja if cylinders are 'gelijksluitend', else 'N.v.t'",
+        Args:
+            main_text: Main product text
+            subproduct_text: Subproduct texts
 
-  "soort_dorpel": "Threshold type (e.g. 'Hardstenen dorpel', 'Aluminium dorpel') or 'N.v.t'",
-  "brievenbus": "Ja if mailbox mentioned, else 'N.v.t'",
-  "afwatering": "Drainage info or 'N.v.t'",
+        Returns:
+            Dict with the spec fields found (dimensions, cilinder_gelijksluitend)
+        """
+        known = {}
 
-  "extra_opties": "List all extra options, surcharges (meerprijs), special features. Join with newlines. Use 'N.v.t' if none.",
-  "opmerkingen": "Additional notes or special remarks for internal team or 'N.v.t'",
+        dimensions = extract_dimensions_from_text(main_text)
+        if dimensions:
+            known.update(dimensions)
+            known['geoffreerde_afmetingen'] = f"{dimensions['breedte']}x{dimensions['hoogte']} mm"
 
-  "korting_bedrag": "Total discount amount in euros (numeric). Look for 'korting', 'totaal minbedrag', 'discount', negative prices. If no discount mentioned, use 0."
-}}
+        # Only a positive mention ("niet gelijksluitend" is left to the LLM)
+        if any(
+            not match.group(1)
+            for text in (main_text, subproduct_text)
+            for match in _GELIJKSLUITEND_RE.finditer(text)
+        ):
+            known['cilinder_gelijksluitend'] = 'Ja'
 
-RULES:
-- Extract dimensions from patterns like (1234x5678mm) or (1234x5678)
-- For "locatie": Look for floor+position patterns ('begane grond voorgevel', 'eerste verdieping achtergevel', 'begane grond zijgevel'), room names ('Slaapkamer', 'Woonkamer', 'Badkamer', 'Zolder', 'Garage'), or 'Plaats:' text. Often appears after dimensions.
-- For "glas_type", ONLY use one of these exact values: Triple, HR++, HR+++, Veiligheidsglas, Dubbelglas, Anders
-- For boolean-like fields (cilinder_gelijksluitend, brievenbus), return "Ja" if mentioned, else "N.v.t"
-- For colors: Distinguish between kozijn (frame) and vleugel (sash/wing). Look for RAL codes, color names in subproducts with "Meerprijs afwijkende kleur"
-- For hardware: look for "beslag", "greep", "cilinder", "hang- en sluitwerk", "scharnieren"
-- If a field is not mentioned or not applicable to this product type, use "N.v.t"
-- Return ONLY valid JSON, no markdown or extra text
-"""
+        return known
 
 
 # Singleton instance
 _extractor = None
+_extractor_lock = threading.Lock()
 
 
 def get_llm_extractor() -> LLMSpecExtractor:
-    """Get or create LLM extractor singleton."""
+    """Get or create LLM extractor singleton (safe to call from several threads)."""
     global _extractor
     if _extractor is None:
-        _extractor = LLMSpecExtractor()
+        with _extractor_lock:
+            if _extractor is None:
+                _extractor = LLMSpecExtractor()
     return _extractor
 
 
@@ -206,3 +444,21 @@ def extract_specs_with_llm(
     """
     extractor = get_llm_extractor()
     return extractor.extract_specs_from_pricetable(pricetable, element_type)
+
+
+def extract_specs_with_llm_batch(
+    pricetables: List[Dict[str, Any]],
+    element_types: List[Optional[str]]
+) -> List[Dict[str, Any]]:
+    """
+    Convenience function to extract specs for all pricetables of a proposal.
+
+    Args:
+        pricetables: Pricetable dicts with 'rows' lists
+        element_types: Element type hint per pricetable
+
+    Returns:
+        List of extracted specs dicts, one per pricetable
+    """
+    extractor = get_llm_extractor()
+    return extractor.extract_specs_from_pricetables(pricetables, element_types)
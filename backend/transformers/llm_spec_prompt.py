@@ -0,0 +1,218 @@
+"""
+Prompt for LLM spec extraction: function-calling schema, system messages and product text.
+
+The tool schemas and system messages form the fixed request prefix shared by
+every extraction call; only the product text in the user message varies.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
+import orjson
+
+# selectolax (lexbor, C) parses HTML fragments much faster than bs4
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # fall back to plain lxml when selectolax is not installed
+    LexborHTMLParser = None
+    from lxml import etree
+
+# Part of every cache key: bump when the prompt, schema or post-processing changes
+# so extractions made with the old prompt are not reused
+LLM_PROMPT_VERSION = 3
+
+# RAL color codes (e.g. "RAL 7016", "ral9001")
+_RAL_RE = re.compile(r'\bRAL\s?(\d{4})\b', re.IGNORECASE)
+
+
+_NVT = "N.v.t"
+
+
+def _text(description: str) -> Dict[str, Any]:
+    """Schema for a free-text spec field."""
+    return {"type": "string", "description": description}
+
+
+def _choice(description: str, *values: str) -> Dict[str, Any]:
+    """Schema for a spec field limited to values (or "N.v.t")."""
+    return {"type": "string", "enum": [*values, _NVT], "description": description}
+
+
+# Spec fields as a function-calling schema: the API enforces names, types and
+# allowed values, so the model doesn't spend output tokens on a free-form JSON object
+SPEC_PROPERTIES = {
+    "product_name": _text("Clean product name without dimensions"),
+    "geoffreerde_afmetingen": _text("Full dimension string like '2450x1760 mm' or 'N.v.t'"),
+    "breedte": {"type": ["number", "null"], "description": "Width in mm, or null"},
+    "hoogte": {"type": ["number", "null"], "description": "Height in mm, or null"},
+    "locatie": _text(
+        "Location/placement description. Look for: Floor + position (e.g. 'begane grond voorgevel', "
+        "'eerste verdieping achtergevel', 'begane grond zijgevel'), room names (e.g. 'Slaapkamer', "
+        "'Woonkamer', 'Zolder'), or 'Plaats:' text. Use 'N.v.t' only if truly not mentioned."
+    ),
+
+    "glas_type": _choice("Glass type", "Triple", "HR++", "HR+++", "Veiligheidsglas", "Dubbelglas", "Anders"),
+
+    "kleur_kozijn_binnen": _text("Inside frame color (RAL code or description) or 'N.v.t'"),
+    "kleur_vleugel_binnen": _text("Inside sash/wing color (RAL code or description) or 'N.v.t'"),
+    "kleur_kozijn_buiten": _text("Outside frame color (RAL code or description) or 'N.v.t'"),
+    "kleur_vleugel_buiten": _text("Outside sash/wing color (RAL code or description) or 'N.v.t'"),
+    "kleur_binnenafwerking": _text("Interior finish color or type or 'N.v.t'"),
+    "kleur_afstandhouders": _choice(
+        "Spacer color. Default is 'Aluminium' unless specifically mentioned as 'Zwart'", "Aluminium", "Zwart"
+    ),
+
+    "model_deurpaneel": _text("Door panel model name or type (e.g. 'Paneeldeur', 'Vlakke deur') or 'N.v.t'"),
+    "type_profiel_kozijn": _text(
+        "Frame/profile type (e.g. 'Kunststof', 'Aluminium', 'Hout', 'Verdiept kunststof') or 'N.v.t'"
+    ),
+
+    "draairichting": _choice("Turning direction for doors, from inside view", "Links", "Rechts"),
+
+    "kleur_deurbeslag_binnen": _text("Color of inside door hardware or 'N.v.t'"),
+    "kleur_deurbeslag_buiten": _text("Color of outside door hardware or 'N.v.t'"),
+    "soort_staafgreep": _text("Bar handle type/specs (e.g. 'RVS P45 30x600mm') or 'N.v.t'"),
+    "kleur_scharnieren": _text("Hinge color or 'N.v.t'"),
+    "type_cilinder": _text("Cylinder type (e.g. 'Gelijksluitende cilinders') or 'N.v.t'"),
+    "cilinder_gelijksluitend": _choice("Ja if cylinders are 'gelijksluitend'", "Ja"),
+
+    "soort_dorpel": _text("Threshold type (e.g. 'Hardstenen dorpel', 'Aluminium dorpel') or 'N.v.t'"),
+    "brievenbus": _choice("Ja if mailbox mentioned", "Ja"),
+    "afwatering": _text("Drainage info or 'N.v.t'"),
+
+    "extra_opties": _text(
+        "List all extra options, surcharges (meerprijs), special features. Join with newlines. "
+        "Use 'N.v.t' if none."
+    ),
+    "opmerkingen": _text("Additional notes or special remarks for internal team or 'N.v.t'"),
+
+    "korting_bedrag": {
+        "type": "number",
+        "description": "Total discount amount in euros. Look for 'korting', 'totaal minbedrag', 'discount', "
+                       "negative prices. If no discount mentioned, use 0."
+    },
+}
+
+SPEC_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "extract_specs",
+        "description": "Record the specs extracted from a Dutch construction product description.",
+        "parameters": {
+            "type": "object",
+            "properties": SPEC_PROPERTIES,
+            "required": list(SPEC_PROPERTIES),
+        },
+    },
+}
+
+# Same fields for several products at once, one results entry per product. Each
+# entry names its PRODUCT number, so results are never matched up by position alone
+BATCH_SPEC_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "extract_specs_batch",
+        "description": "Record the specs extracted from several Dutch construction product descriptions.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "description": "One entry per PRODUCT, in the order given",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "product": {"type": "integer", "description": "The PRODUCT number of this entry"},
+                            **SPEC_PROPERTIES,
+                        },
+                        "required": ["product", *SPEC_PROPERTIES],
+                    },
+                },
+            },
+            "required": ["results"],
+        },
+    },
+}
+
+# Fixed instructions, sent as the system message. Together with the tool schema
+# this forms an identical request prefix on every call, which the provider's
+# automatic prompt caching can reuse; only the user message varies per element.
+# Keep the prefix static (no per-call values) and above the 1024-token caching
+# minimum: tool schema + system message are ~1.2k tokens today.
+_SYSTEM_MESSAGE_TEMPLATE = """You are an expert at extracting structured data from Dutch construction proposals. Extract specs accurately.
+
+{call_instruction} Use "N.v.t" if a field is not mentioned or not applicable.
+
+RULES:
+- Extract dimensions from patterns like (1234x5678mm) or (1234x5678)
+- For "locatie": Look for floor+position patterns ('begane grond voorgevel', 'eerste verdieping achtergevel', 'begane grond zijgevel'), room names ('Slaapkamer', 'Woonkamer', 'Badkamer', 'Zolder', 'Garage'), or 'Plaats:' text. Often appears after dimensions.
+- For boolean-like fields (cilinder_gelijksluitend, brievenbus), return "Ja" if mentioned, else "N.v.t"
+- For colors: Distinguish between kozijn (frame) and vleugel (sash/wing). Look for RAL codes, color names in subproducts with "Meerprijs afwijkende kleur"
+- For hardware: look for "beslag", "greep", "cilinder", "hang- en sluitwerk", "scharnieren"
+- If a field is not mentioned or not applicable to this product type, use "N.v.t"
+"""
+
+SYSTEM_MESSAGE = _SYSTEM_MESSAGE_TEMPLATE.format(
+    call_instruction="Call extract_specs with all fields."
+)
+BATCH_SYSTEM_MESSAGE = _SYSTEM_MESSAGE_TEMPLATE.format(
+    call_instruction="Call extract_specs_batch with one results entry per PRODUCT, in the same order, "
+                     "each with its PRODUCT number and all fields. Products are independent: only use "
+                     "a product's own text."
+)
+
+
+# Subproduct rows (colors, hordeur, glass options) repeat across pricetables and
+# proposals, so the parsed text is memoized per HTML fragment
+@lru_cache(maxsize=1024)
+def html_to_lines(html: str) -> Tuple[str, ...]:
+    """
+    Convert an HTML fragment to clean readable text lines.
+
+    Returns one line per non-empty p/li/em element, or a single line with
+    all text if there are none.
+    """
+    if LexborHTMLParser is not None:
+        tree = LexborHTMLParser(html)
+        lines = tuple(text for node in tree.css('p, li, em') if (text := node.text(strip=True)))
+        return lines or (tree.body.text(strip=True) if tree.body else '',)
+
+    # lxml directly, without a bs4 tree on top (etree.HTML uses lxml's per-thread parser)
+    root = etree.HTML(html) if html.strip() else None
+    if root is None:
+        return ('',)
+
+    # Script/style text is not visible text (cleared in place so the text around stays separate)
+    for element in root.iter('script', 'style'):
+        element.text = None
+
+    # Each text node stripped and joined, like bs4/lexbor's text(strip=True)
+    lines = tuple(
+        text for element in root.iter('p', 'li', 'em')
+        if (text := ''.join(part.strip() for part in element.itertext()))
+    )
+    return lines or (''.join(part.strip() for part in root.itertext()),)
+
+
+def build_product_text(
+    main_text: str,
+    subproduct_text: str,
+    element_type: Optional[str],
+    known_fields: Optional[Dict[str, Any]] = None
+) -> str:
+    """Build one element's part of the user message for LLM spec extraction."""
+
+    type_hint = f"\n\nHint: This is a {element_type} product." if element_type else ""
+
+    # Ground truth for the LLM: regex-extracted fields and RAL codes present in the text
+    if known_fields:
+        type_hint += f"\n\nKNOWN FIELDS (already extracted, use as-is):\n{orjson.dumps(known_fields).decode()}"
+    ral_codes = sorted({f"RAL {code}" for code in _RAL_RE.findall(f"{main_text}\n{subproduct_text}")})
+    if ral_codes:
+        type_hint += f"\n\nRAL codes in this product: {', '.join(ral_codes)}"
+
+    return f"""MAIN PRODUCT:
+{main_text}
+
+SUBPRODUCTS (colors, glass, hardware, options):
+{subproduct_text}{type_hint}"""
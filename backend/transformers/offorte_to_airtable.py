@@ -8,8 +8,8 @@ Key Transformation Strategy:
 - HTML content parsed for Element Specificaties
 """
 
-from typing import Dict, List, Any, Optional
-from bs4 import BeautifulSoup
+import re
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from loguru import logger
 
@@ -18,20 +18,54 @@ from backend.transformers.specs_parser import (
     extract_specs_from_pricetable,
     extract_dimensions_from_text,
     extract_product_name_clean,
-    determine_element_type_enhanced
+    determine_element_type_enhanced,
+    parse_row_html
 )
 # Import LLM-based extractor for high-precision spec extraction
-from backend.transformers.llm_spec_extractor import extract_specs_with_llm
+from backend.transformers.llm_spec_extractor import extract_specs_with_llm, extract_specs_with_llm_batch
 # Import technical specification defaults
 from backend.transformers.tech_spec_defaults import apply_tech_spec_defaults, check_for_overrides
+# STB-ADMINISTRATIE records (Inmeetplanning, Projecten, Facturatie)
+from backend.transformers.administratie_transforms import transform_proposal_to_administratie
+
+
+# Subproduct Categorie by keyword, first match wins (checked against lowercased name + description)
+_SUBPRODUCT_CATEGORY_RULES = (
+    (re.compile(r'kleur|ral|afwijkend|coating'), "Kleur"),
+    (re.compile(r'glas|beglazing|glazen|melkglas|gezandstraald'), "Glas"),
+    (re.compile(r'beslag|greep|cilinder|knop|staafgreep|deurgreep|sluitwerk|hang-'), "Beslag"),
+    (re.compile(r'hordeur'), "Hordeur"),
+    (re.compile(r'dorpel|onderdorpel'), "Dorpel"),
+    (re.compile(r'ventilatie|rooster'), "Ventilatie"),
+    (re.compile(r'brievenbus|kozijnverbreding|demonteren|monteren'), "Accessoire"),
+)
+
+_SUBPRODUCT_KORTING_RE = re.compile(r'korting|afprijzing')
+_SUBPRODUCT_OPTIE_RE = re.compile(r'optie|extra')
+_SUBPRODUCT_ACCESSOIRE_RE = re.compile(r'accessoire|brievenbus|demonteren')
+
+# Subproduct names that mean "nothing selected"
+_NVT_NAMES = frozenset(('n.v.t', 'n.v.t.', 'nvt'))
+
+# Customer name fields, in order of preference
+_CUSTOMER_NAME_KEYS = ('company_name', 'name', 'fullname')
+
 
+def _customer_name(customer: Dict[str, Any]) -> str:
+    """First non-empty customer name field, or ''."""
+    return next((value for key in _CUSTOMER_NAME_KEYS if (value := customer.get(key))), '')
 
-def transform_proposal_to_klantenportaal(proposal_data: Dict[str, Any]) -> Dict[str, Any]:
+
+def transform_proposal_to_klantenportaal(
+    proposal_data: Dict[str, Any],
+    imported_at: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Transform Offorte proposal to Klantenportaal record.
 
     Args:
         proposal_data: Full proposal data from Offorte API
+        imported_at: Import timestamp ('%Y-%m-%d %H:%M'), defaults to now
 
     Returns:
         Dictionary ready for Airtable Klantenportaal table
@@ -44,8 +78,7 @@ def transform_proposal_to_klantenportaal(proposal_data: Dict[str, Any]) -> Dict[
     zipcode = customer.get('zip_code') or customer.get('zipcode', '')
     city = customer.get('city', '')
 
-    address_parts = [street, zipcode, city]
-    full_address = ', '.join([p for p in address_parts if p])
+    full_address = ', '.join(filter(None, (street, zipcode, city)))
 
     # Get pricing (webhook has different structure)
     pricing = proposal_data.get('pricing', {})
@@ -72,14 +105,57 @@ def transform_proposal_to_klantenportaal(proposal_data: Dict[str, Any]) -> Dict[
 
     return {
         "Opdrachtnummer": str(proposal_data.get('id', '')),
-        "Klantnaam": customer.get('company_name', '') or customer.get('name', '') or customer.get('fullname', ''),
+        "Klantnaam": _customer_name(customer),
         "Adres": full_address,
         "Telefoon": customer.get('phone', ''),
         "E-mail": customer.get('email', ''),
         "Totaalprijs Excl BTW": total_excl,
         "Totaalprijs Incl BTW": total_incl,
         "Offerte Elementen Overzicht": elements_summary,
-        "Verkoop Notities": f"Geïmporteerd uit Offorte op {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+        "Verkoop Notities": f"Geïmporteerd uit Offorte op {imported_at or datetime.now().strftime('%Y-%m-%d %H:%M')}"
+    }
+
+
+def _pricetable_prices(rows: List[Dict[str, Any]]) -> Tuple[float, int, float]:
+    """
+    Read the prices of a pricetable's rows.
+
+    Args:
+        rows: Pricetable rows (not empty), hoofdproduct first
+
+    Returns:
+        Tuple of (main price, main quantity, subproducten total)
+    """
+    main_row = rows[0]
+    main_price = float(main_row.get('price', 0))
+    main_quantity = int(main_row.get('quantity', 1))
+    subproduct_total = sum(
+        float(row.get('price', 0)) * int(row.get('quantity', 1))
+        for row in rows[1:]
+    )
+    return main_price, main_quantity, subproduct_total
+
+
+def _parse_pricetable(pricetable: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Parse a pricetable's HTML and prices once for all transforms that need it.
+
+    Args:
+        pricetable: Pricetable data from Offorte
+
+    Returns:
+        Dict with 'specs' (pattern-based specs of all rows), 'product_name'
+        (clean main product name), 'element_type' and 'prices'
+        (_pricetable_prices result, None without rows)
+    """
+    rows = pricetable.get('rows', [])
+    html_content = rows[0].get('content', '') if rows else ''
+    product_name = extract_product_name_clean(html_content)
+    return {
+        'specs': extract_specs_from_pricetable(pricetable),
+        'product_name': product_name,
+        'element_type': determine_element_type_enhanced(product_name, html_content),
+        'prices': _pricetable_prices(rows) if rows else None,
     }
 
 
@@ -88,7 +164,8 @@ def transform_pricetable_to_element(
     proposal_id: str,
     customer_name: str,
     element_index: int,
-    discount_percentage: float = 0
+    discount_percentage: float = 0,
+    parsed: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
     Transform a single Offorte pricetable into an Element record.
@@ -100,6 +177,7 @@ def transform_pricetable_to_element(
         proposal_id: Proposal ID (opdrachtnummer)
         customer_name: Customer name
         element_index: Sequential index for this element (0-based)
+        parsed: Result of _parse_pricetable for this pricetable (skips reparsing)
 
     Returns:
         Dictionary for Elementen Overzicht table
@@ -116,7 +194,7 @@ def transform_pricetable_to_element(
     element_id = f"{proposal_id}-E{element_index + 1}"
 
     # Extract specs from ENTIRE pricetable (main + subproducts)
-    specs = extract_specs_from_pricetable(pricetable)
+    specs = parsed['specs'] if parsed else extract_specs_from_pricetable(pricetable)
 
     # Extract product name and dimensions from main row
     html_content = main_row.get('content', '')
@@ -126,7 +204,7 @@ def transform_pricetable_to_element(
     if not product_name:
         product_name = main_row.get('product_name', '')
         if not product_name:
-            product_name = extract_product_name_clean(html_content)
+            product_name = parsed['product_name'] if parsed else extract_product_name_clean(html_content)
 
     # Determine element type using enhanced detection
     element_type = determine_element_type_enhanced(product_name, html_content)
@@ -135,16 +213,11 @@ def transform_pricetable_to_element(
     description = main_row.get('description', '')
 
     # Calculate pricing
-    main_price = float(main_row.get('price', 0))
-    main_quantity = int(main_row.get('quantity', 1))
+    main_price, main_quantity, subproduct_total = parsed['prices'] if parsed else _pricetable_prices(rows)
     main_subtotal = main_price * main_quantity
 
     # Count subproducten (rows beyond first)
     subproduct_count = len(rows) - 1
-    subproduct_total = sum(
-        float(row.get('price', 0)) * int(row.get('quantity', 1))
-        for row in rows[1:]
-    )
 
     # Element totals
     element_subtotal = main_subtotal + subproduct_total
@@ -188,7 +261,9 @@ def transform_pricetable_to_specs(
     pricetable: Dict[str, Any],
     element_id: str,
     proposal_id: str,
-    customer_name: str
+    customer_name: str,
+    llm_specs: Optional[Dict[str, Any]] = None,
+    parsed: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
     Transform pricetable into Element Specificaties record with LLM-based extraction.
@@ -201,6 +276,8 @@ def transform_pricetable_to_specs(
         element_id: Generated element ID
         proposal_id: Proposal ID
         customer_name: Customer name
+        llm_specs: Specs already extracted by the LLM (skips the LLM call)
+        parsed: Result of _parse_pricetable for this pricetable (skips reparsing)
 
     Returns:
         Dictionary for Element Specificaties table
@@ -213,12 +290,18 @@ def transform_pricetable_to_specs(
     html_content = main_row.get('content', '')
 
     # First, determine element type using pattern-based detection (fast)
-    product_name = extract_product_name_clean(html_content)
-    element_type = determine_element_type_enhanced(product_name, html_content)
+    if parsed:
+        product_name = parsed['product_name']
+        element_type = parsed['element_type']
+    else:
+        product_name = extract_product_name_clean(html_content)
+        element_type = determine_element_type_enhanced(product_name, html_content)
 
     # Extract ALL specs using LLM (high precision)
-    logger.info(f"Using LLM to extract specs for {element_type}: {product_name}")
-    specs = extract_specs_with_llm(pricetable, element_type)
+    if llm_specs is None:
+        logger.info(f"Using LLM to extract specs for {element_type}: {product_name}")
+        llm_specs = extract_specs_with_llm(pricetable, element_type)
+    specs = llm_specs
 
     # Apply default technical specifications for N.v.t fields
     specs = apply_tech_spec_defaults(specs)
@@ -316,8 +399,6 @@ def transform_pricetable_rows_to_subproducten(
     Returns:
         List of dictionaries for Subproducten table
     """
-    from bs4 import BeautifulSoup
-
     rows = pricetable.get('rows', [])
     if len(rows) <= 1:
         return []  # No subproducten
@@ -326,21 +407,7 @@ def transform_pricetable_rows_to_subproducten(
 
     # Skip first row (that's the hoofdproduct)
     for idx, row in enumerate(rows[1:], start=1):
-        # Parse HTML content from Offorte API
-        html_content = row.get('content', '')
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        # Extract product name from first <p> tag
-        first_p = soup.find('p')
-        product_name = first_p.get_text(strip=True) if first_p else 'N.v.t'
-
-        # Description: any additional text or <li> items
-        description = ''
-        li_items = soup.find_all('li')
-        if li_items:
-            description = '\n'.join([li.get_text(strip=True) for li in li_items])
-
-        # Skip unselected optional products (checkboxes not checked)
+        # Skip unselected optional products (checkboxes not checked) before parsing their HTML
         # selectable=True means it's an optional add-on
         # user_selected=True means the customer checked the box
         if row.get('selectable') and not row.get('user_selected'):
@@ -350,10 +417,22 @@ def transform_pricetable_rows_to_subproducten(
         quantity = int(row.get('quantity', 1))
         subtotal = price * quantity
 
-        # Skip meaningless rows: €0 with quantity 0, or N.v.t with €0
+        # Skip meaningless rows: €0 with quantity 0
         if subtotal == 0 and quantity == 0:
             continue
-        if product_name.lower() in ['n.v.t', 'n.v.t.', 'nvt'] and price == 0:
+
+        # Parse HTML content from Offorte API (shared with the specs parser, which read this row already)
+        parsed = parse_row_html(row.get('content', ''))
+
+        # Extract product name from first <p> tag
+        product_name = parsed.title if parsed.title is not None else 'N.v.t'
+
+        # Description: any additional text or <li> items
+        description = '\n'.join(parsed.li_texts)
+
+        # Skip N.v.t with €0
+        product_lower = product_name.lower()
+        if product_lower in _NVT_NAMES and price == 0:
             continue
 
         # Generate unique Subproduct ID: element_id-S1, element_id-S2, etc.
@@ -362,35 +441,21 @@ def transform_pricetable_rows_to_subproducten(
         # Determine subproduct category and type
         # Subproduct Categorie: what kind of product (Kleur, Glas, Beslag, Hordeur, etc.)
         # Subproduct Type: pricing nature (Meerprijs, Optie, Accessoire, Korting)
-        product_lower = product_name.lower()
-        description_lower = description.lower()
-        combined_text = f"{product_lower} {description_lower}"
+        combined_text = f"{product_lower} {description.lower()}"
 
         # Determine category with improved keyword matching
-        if any(word in combined_text for word in ['kleur', 'ral', 'afwijkend', 'coating']):
-            category = "Kleur"
-        elif any(word in combined_text for word in ['glas', 'beglazing', 'glazen', 'melkglas', 'gezandstraald']):
-            category = "Glas"
-        elif any(word in combined_text for word in ['beslag', 'greep', 'cilinder', 'knop', 'staafgreep', 'deurgreep', 'sluitwerk', 'hang-']):
-            category = "Beslag"
-        elif 'hordeur' in combined_text:
-            category = "Hordeur"
-        elif any(word in combined_text for word in ['dorpel', 'onderdorpel']):
-            category = "Dorpel"
-        elif any(word in combined_text for word in ['ventilatie', 'rooster']):
-            category = "Ventilatie"
-        elif any(word in combined_text for word in ['brievenbus', 'kozijnverbreding', 'demonteren', 'monteren']):
-            category = "Accessoire"
-        else:
-            category = "Anders"
+        category = next(
+            (name for pattern, name in _SUBPRODUCT_CATEGORY_RULES if pattern.search(combined_text)),
+            "Anders"
+        )
 
         # Determine type (most Offorte items are meerprijs/options)
         subproduct_type = "Meerprijs"  # Default
-        if 'korting' in combined_text or 'afprijzing' in combined_text or price < 0:
+        if price < 0 or _SUBPRODUCT_KORTING_RE.search(combined_text):
             subproduct_type = "Korting"
-        elif 'optie' in combined_text or 'extra' in combined_text:
+        elif _SUBPRODUCT_OPTIE_RE.search(combined_text):
             subproduct_type = "Optie"
-        elif 'accessoire' in combined_text or 'brievenbus' in combined_text or 'demonteren' in combined_text:
+        elif _SUBPRODUCT_ACCESSOIRE_RE.search(combined_text):
             subproduct_type = "Accessoire"
 
         subproducten.append({
@@ -470,51 +535,45 @@ def transform_proposal_to_all_records(proposal_data: Dict[str, Any]) -> Dict[str
 
     # Handle both webhook payload (data.contact) and API response (data.customer)
     customer = proposal_data.get('customer') or proposal_data.get('contact', {})
-    customer_name = customer.get('company_name', '') or customer.get('name', '') or customer.get('fullname', '')
+    customer_name = _customer_name(customer)
 
     # Handle both webhook payload (data.content.pricetables) and API response (data.pricetables)
     content = proposal_data.get('content', {})
     pricetables = content.get('pricetables', []) if content else proposal_data.get('pricetables', [])
 
-    # Get proposal date
+    # One timestamp for the whole proposal, shared by Klantenportaal and Nacalculatie
+    imported_at = datetime.now().strftime('%Y-%m-%d %H:%M')
+
+    # Get proposal date (falls back to the import date)
     proposal_date = proposal_data.get('won_at') or proposal_data.get('created_at')
     if proposal_date:
         # Convert to date string if needed
         proposal_date = proposal_date.split('T')[0] if 'T' in proposal_date else proposal_date
+    else:
+        proposal_date = imported_at.split(' ')[0]
 
     logger.info(f"Transforming proposal {proposal_id} with {len(pricetables)} pricetables")
 
     # 1. Klantenportaal (1 record per proposal)
-    klantenportaal = [transform_proposal_to_klantenportaal(proposal_data)]
+    klantenportaal = [transform_proposal_to_klantenportaal(proposal_data, imported_at)]
+
+    # Parse each pricetable's HTML once; every transform below reuses the result
+    parsed_pricetables = [_parse_pricetable(pricetable) for pricetable in pricetables]
 
     # FIRST PASS: Extract specs and calculate total discount
     total_subtotal = 0
     total_discount = 0
-    pricetable_subtotals = []
 
-    for idx, pricetable in enumerate(pricetables):
-        rows = pricetable.get('rows', [])
-        if not rows:
-            pricetable_subtotals.append(0)
+    for parsed in parsed_pricetables:
+        if parsed['prices'] is None:
             continue
 
         # Calculate element subtotal
-        main_row = rows[0]
-        main_price = float(main_row.get('price', 0))
-        main_quantity = int(main_row.get('quantity', 1))
-        main_subtotal = main_price * main_quantity
-
-        subproduct_total = sum(
-            float(row.get('price', 0)) * int(row.get('quantity', 1))
-            for row in rows[1:]
-        )
-
-        element_subtotal = main_subtotal + subproduct_total
-        pricetable_subtotals.append(element_subtotal)
-        total_subtotal += element_subtotal
+        main_price, main_quantity, subproduct_total = parsed['prices']
+        total_subtotal += main_price * main_quantity + subproduct_total
 
         # Extract discount from LLM specs
-        specs = extract_specs_from_pricetable(pricetable)
+        specs = parsed['specs']
         korting_bedrag = float(specs.get('korting_bedrag', 0))
         total_discount += korting_bedrag
 
@@ -522,6 +581,11 @@ def transform_proposal_to_all_records(proposal_data: Dict[str, Any]) -> Dict[str
     discount_percentage = (total_discount / total_subtotal * 100) if total_subtotal > 0 else 0
     logger.info(f"Total discount: €{total_discount:.2f} on subtotal €{total_subtotal:.2f} = {discount_percentage:.2f}%")
 
+    # LLM spec extraction for all elements up front (the API calls run concurrently)
+    element_types = [parsed['element_type'] for parsed in parsed_pricetables]
+    logger.info(f"Using LLM to extract specs for {len(pricetables)} pricetables")
+    all_llm_specs = extract_specs_with_llm_batch(pricetables, element_types)
+
     # 2-5. Per pricetable: Element, Specs, Subproducten, Nacalculatie
     elementen_overzicht = []
     hoofdproduct_specificaties = []
@@ -531,7 +595,8 @@ def transform_proposal_to_all_records(proposal_data: Dict[str, Any]) -> Dict[str
     for idx, pricetable in enumerate(pricetables):
         # Element record
         element = transform_pricetable_to_element(
-            pricetable, proposal_id, customer_name, idx, discount_percentage
+            pricetable, proposal_id, customer_name, idx, discount_percentage,
+            parsed=parsed_pricetables[idx]
         )
         if not element:
             continue
@@ -542,7 +607,9 @@ def transform_proposal_to_all_records(proposal_data: Dict[str, Any]) -> Dict[str
 
         # Specificaties record
         specs = transform_pricetable_to_specs(
-            pricetable, element_id, proposal_id, customer_name
+            pricetable, element_id, proposal_id, customer_name,
+            llm_specs=all_llm_specs[idx],
+            parsed=parsed_pricetables[idx]
         )
         if specs:
             hoofdproduct_specificaties.append(specs)
@@ -564,21 +631,15 @@ def transform_proposal_to_all_records(proposal_data: Dict[str, Any]) -> Dict[str
         f"{len(nacalculatie)} nacalculatie records"
     )
 
-    # 6. Inmeetplanning (STB-ADMINISTRATIE) - 1 record per proposal
-    from backend.transformers.administratie_transforms import transform_proposal_to_inmeetplanning
-    inmeetplanning = [transform_proposal_to_inmeetplanning(
+    # 6-8. STB-ADMINISTRATIE: Inmeetplanning (1), Projecten (1), Facturatie (3: 30%, 65%, 5%)
+    administratie = transform_proposal_to_administratie(
         proposal_data,
         elementen_overzicht=elementen_overzicht,
         hoofdproduct_specs=hoofdproduct_specificaties
-    )]
-
-    # 7. Projecten (STB-ADMINISTRATIE) - 1 record per proposal
-    from backend.transformers.administratie_transforms import transform_proposal_to_project
-    projecten = [transform_proposal_to_project(proposal_data)]
-
-    # 8. Facturatie (STB-ADMINISTRATIE) - 3 records per proposal (30%, 65%, 5%)
-    from backend.transformers.administratie_transforms import transform_proposal_to_facturatie
-    facturatie = transform_proposal_to_facturatie(proposal_data)
+    )
+    inmeetplanning = administratie["inmeetplanning"]
+    projecten = administratie["projecten"]
+    facturatie = administratie["facturatie"]
 
     logger.info(
         f"Created {len(inmeetplanning)} inmeetplanning, {len(projecten)} project, "
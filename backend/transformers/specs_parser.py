@@ -8,11 +8,44 @@ Handles flexible product structures:
 """
 
 import re
-from typing import Dict, List, Any
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
 from bs4 import BeautifulSoup
+import orjson
 from loguru import logger
 
 
+@dataclass(slots=True, frozen=True)
+class ParsedRow:
+    """Text of one pricetable row's HTML, as read by the spec and subproduct transforms."""
+    title: Optional[str]  # First <p>, None if the row has no <p>
+    li_texts: Tuple[str, ...]
+    em_texts: Tuple[str, ...]
+    all_text: str
+
+
+@lru_cache(maxsize=1024)
+def parse_row_html(html_content: str) -> ParsedRow:
+    """
+    Parse a row's HTML once; the specs parser and the Subproducten transform share the result.
+
+    Args:
+        html_content: Row HTML from Offorte
+
+    Returns:
+        ParsedRow with the first <p>, <li> and <em> texts and all text (each stripped)
+    """
+    soup = BeautifulSoup(html_content, 'lxml')
+    title_p = soup.find('p')
+    return ParsedRow(
+        title=title_p.get_text(strip=True) if title_p else None,
+        li_texts=tuple(li.get_text(strip=True) for li in soup.find_all('li')),
+        em_texts=tuple(em.get_text(strip=True) for em in soup.find_all('em')),
+        all_text=soup.get_text(strip=True),
+    )
+
+
 def extract_dimensions_from_text(text: str) -> Dict[str, int]:
     """
     Extract dimensions in format (1234x5678mm) or (1234x5678) from text.
@@ -46,7 +79,7 @@ def extract_product_name_clean(html_content: str) -> str:
     Returns:
         Clean product name without dimensions
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = BeautifulSoup(html_content, 'lxml')
     text = soup.get_text(strip=True)
 
     # Remove dimensions pattern (1234x5678mm)
@@ -147,7 +180,7 @@ def extract_specs_from_pricetable(pricetable: Dict[str, Any]) -> Dict[str, Any]:
     # Parse main product (first row)
     main_row = rows[0]
     main_html = main_row.get('content', '')
-    main_soup = BeautifulSoup(main_html, 'html.parser')
+    main_soup = BeautifulSoup(main_html, 'lxml')
 
     # Extract product name (just the first <p>, not all text)
     first_p = main_soup.find('p')
@@ -170,19 +203,16 @@ def extract_specs_from_pricetable(pricetable: Dict[str, Any]) -> Dict[str, Any]:
 
     # Parse subproducts for additional specs
     for row in rows[1:]:
-        html = row.get('content', '')
-        soup = BeautifulSoup(html, 'html.parser')
+        parsed = parse_row_html(row.get('content', ''))
 
         # Get all text content
-        all_text = soup.get_text(strip=True).lower()
+        all_text = parsed.all_text.lower()
 
         # Get title (first <p>)
-        title_p = soup.find('p')
-        title = title_p.get_text(strip=True).lower() if title_p else ''
+        title = parsed.title.lower() if parsed.title is not None else ''
 
         # Get emphasized details (<em> tags)
-        em_tags = soup.find_all('em')
-        em_texts = [em.get_text(strip=True) for em in em_tags]
+        em_texts = parsed.em_texts
 
         # === KLEUR DETECTIE ===
         if 'kleur' in title or 'ral' in title:
@@ -239,7 +269,7 @@ def extract_specs_from_pricetable(pricetable: Dict[str, Any]) -> Dict[str, Any]:
         if any(keyword in all_text for keyword in ['meerprijs', 'optie', 'afstandsbediening', 'box']):
             if 'extra_opties' not in specs:
                 specs['extra_opties'] = []
-            option_text = title_p.get_text(strip=True) if title_p else ''
+            option_text = parsed.title or ''
             if em_texts:
                 option_text += ' - ' + ', '.join(em_texts)
             specs['extra_opties'].append(option_text)
@@ -248,7 +278,7 @@ def extract_specs_from_pricetable(pricetable: Dict[str, Any]) -> Dict[str, Any]:
     if 'extra_opties' in specs:
         specs['extra_opties'] = '\n'.join(specs['extra_opties'])
 
-    logger.debug(f"Extracted specs: {specs}")
+    logger.opt(lazy=True).debug("Extracted specs: {}", lambda: orjson.dumps(specs).decode())
     return specs
 
 
@@ -5,11 +5,26 @@ Uses Celery for task management with Redis as broker and backend.
 """
 
 import asyncio
+import orjson
 from celery import Celery
+from kombu.serialization import register
 from loguru import logger
 
-from backend.services.proposal_sync import process_proposal_sync
+from backend.services.proposal_sync import process_proposal_sync, process_proposals_sync
 from backend.core.settings import settings
+from backend.core.logging_config import configure_logging
+
+configure_logging()
+
+# orjson as a Celery serializer. It produces application/json, so messages
+# stay readable by plain "json" consumers during a rolling deploy.
+register(
+    "orjson",
+    lambda obj: orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),
+    orjson.loads,
+    content_type="application/json",
+    content_encoding="utf-8"
+)
 
 # Configure Celery app
 celery_app = Celery(
@@ -20,9 +35,10 @@ celery_app = Celery(
 
 # Celery configuration
 celery_app.conf.update(
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
+    task_serializer="orjson",
+    accept_content=["orjson", "json"],
+    result_serializer="orjson",
+    result_compression=None,  # results are small, compact JSON already
     timezone="Europe/Amsterdam",
     enable_utc=True,
     task_track_started=True,
@@ -49,13 +65,8 @@ def sync_proposal_task(self, proposal_id: int):
     logger.info(f"Starting sync task {job_id} for proposal {proposal_id}")
 
     try:
-        # Run async code in sync context
-        loop = asyncio.get_event_loop()
-        if loop.is_closed():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
-        result = loop.run_until_complete(
+        # Run async code in sync context (fresh event loop per task)
+        result = asyncio.run(
             process_proposal_sync(proposal_id=proposal_id, job_id=job_id)
         )
 
@@ -76,6 +87,38 @@ def sync_proposal_task(self, proposal_id: int):
         raise self.retry(exc=exc, countdown=countdown)
 
 
+@celery_app.task(bind=True, time_limit=3600, soft_time_limit=3540)
+def sync_proposals_batch_task(self, proposal_ids: list[int], max_concurrency: int = 8):
+    """
+    Background task to sync a batch of proposals (catch-up backfills).
+
+    Args:
+        self: Celery task instance
+        proposal_ids: Offorte proposal IDs
+        max_concurrency: Maximum number of proposals syncing at once
+
+    Returns:
+        List of sync result dictionaries
+    """
+    job_id = self.request.id
+    logger.info(f"Starting batch sync task {job_id} for {len(proposal_ids)} proposals")
+
+    results = asyncio.run(
+        process_proposals_sync(
+            [(proposal_id, job_id) for proposal_id in proposal_ids],
+            max_concurrency=max_concurrency
+        )
+    )
+
+    failed = [r["proposal_id"] for r in results if not r.get("success")]
+    if failed:
+        logger.warning(f"Batch task {job_id} completed with {len(failed)} failed proposals: {failed}")
+    else:
+        logger.info(f"Batch task {job_id} completed successfully")
+
+    return results
+
+
 # Celery beat schedule (optional - for periodic tasks)
 celery_app.conf.beat_schedule = {
     # Example: reconciliation task
@@ -8,6 +8,7 @@ This file contains all field name mappings for:
 Update this file when Airtable table structures change - no code changes needed.
 """
 
+from functools import lru_cache
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 
@@ -380,6 +381,7 @@ TABLE_CONFIGS: Dict[str, TableConfig] = {
 # HELPER FUNCTIONS
 # =============================================================================
 
+@lru_cache(maxsize=64)
 def get_table_config(table_name: str) -> Optional[TableConfig]:
     """Get configuration for a specific table."""
     return TABLE_CONFIGS.get(table_name)
@@ -3,7 +3,7 @@
 
 from backend.transformers.offorte_to_airtable import transform_proposal_to_all_records
 from backend.services.airtable_sync import AirtableSync
-from backend.services.proposal_sync import sync_service
+from backend.services.proposal_sync import get_sync_service
 import json
 
 print("="*80)
@@ -12,7 +12,7 @@ print("="*80)
 
 # Option 1: Use the sync service (will call Offorte API)
 print("\nOption 1: Using sync service (calls Offorte API)...")
-result = sync_service.sync_proposal(309107)
+result = get_sync_service().sync_proposal(309107)
 
 print("\nResult:")
 print(json.dumps(result, indent=2))
@@ -2,7 +2,7 @@
 """Manually sync a proposal to test the complete flow."""
 
 import sys
-from backend.services.proposal_sync import sync_service
+from backend.services.proposal_sync import get_sync_service
 
 # Get proposal ID from command line or use default
 proposal_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
@@ -42,7 +42,7 @@ print("="*80)
 print(f"MANUAL SYNC TEST - Proposal {proposal_id}")
 print("="*80)
 
-result = sync_service.sync_proposal(proposal_id)
+result = get_sync_service().sync_proposal(proposal_id)
 
 print("\n" + "="*80)
 print("SYNC RESULT")
@@ -3,15 +3,26 @@ Pytest configuration and shared fixtures for Offorte-Airtable Sync Agent tests.
 """
 
 import pytest
-from unittest.mock import Mock, AsyncMock
+from unittest.mock import AsyncMock
 from pydantic_ai.models.test import TestModel
 from pydantic_ai.models.function import FunctionModel, AgentInfo
-from pydantic_ai.messages import ModelMessage, ModelTextResponse
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart
 
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# backend.core.settings builds Settings() at import; give the required fields
+# test values so the suite runs without a .env file (real env vars still win)
+for _name, _value in {
+    "OFFORTE_API_KEY": "test_offorte_key",
+    "OFFORTE_ACCOUNT_NAME": "test_account",
+    "AIRTABLE_API_KEY": "test_airtable_key",
+    "AIRTABLE_BASE_STB_ADMINISTRATIE": "appTestAdmin123",
+    "AIRTABLE_BASE_STB_SALES": "appTestSales123",
+}.items():
+    os.environ.setdefault(_name, _value)
+
 from backend.core.settings import Settings
 from backend.core.dependencies import AgentDependencies
 from backend.agent.agent import agent
@@ -33,9 +44,9 @@ def test_settings():
 
         # Airtable Configuration
         airtable_api_key="test_airtable_key",
-        airtable_base_administration="appTestAdmin123",
-        airtable_base_sales_review="appTestSales123",
-        airtable_base_technisch="appTestTech123",
+        airtable_base_stb_administratie="appTestAdmin123",
+        airtable_base_stb_sales="appTestSales123",
+        airtable_base_stb_productie="appTestTech123",
         airtable_rate_limit=5,
 
         # LLM Configuration
@@ -77,21 +88,22 @@ def test_deps(test_settings):
 
 @pytest.fixture
 def test_model():
-    """Create TestModel for basic agent testing."""
-    return TestModel()
+    """Create TestModel for basic agent testing (calls no tools, so no API requests)."""
+    return TestModel(call_tools=[])
 
 
 @pytest.fixture
 def test_agent_with_test_model(test_model):
-    """Create agent with TestModel override for fast testing."""
-    return agent.override(model=test_model)
+    """Agent with its model overridden by TestModel for fast testing."""
+    with agent.override(model=test_model):
+        yield agent
 
 
 @pytest.fixture
 def function_model_simple():
     """Create FunctionModel that returns simple text responses."""
-    async def simple_response(messages: list[ModelMessage], info: AgentInfo) -> ModelTextResponse:
-        return ModelTextResponse(content="Processing complete")
+    async def simple_response(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        return ModelResponse(parts=[TextPart(content="Processing complete")])
 
     return FunctionModel(simple_response)
 
@@ -101,24 +113,20 @@ def function_model_with_tools():
     """Create FunctionModel that simulates tool calling behavior."""
     call_count = {"count": 0}
 
-    async def tool_calling_response(messages: list[ModelMessage], info: AgentInfo) -> ModelTextResponse | dict:
+    async def tool_calling_response(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
         call_count["count"] += 1
 
         if call_count["count"] == 1:
-            # First call - analyze request
-            return ModelTextResponse(content="I'll fetch the proposal data and sync to Airtable")
-        elif call_count["count"] == 2:
-            # Second call - call the process tool
-            return {
-                "tool_process_proposal": {
-                    "proposal_id": 12345
-                }
-            }
+            # First call - call the process tool (a text reply would end the run)
+            return ModelResponse(parts=[ToolCallPart(
+                tool_name="tool_process_proposal",
+                args={"proposal_id": 12345}
+            )])
         else:
             # Final response
-            return ModelTextResponse(
+            return ModelResponse(parts=[TextPart(
                 content="Successfully synced proposal 12345 to all 6 Airtable tables"
-            )
+            )])
 
     return FunctionModel(tool_calling_response)
 
@@ -280,6 +280,30 @@ class TestQueueStatusEndpoint:
         assert "error" in data
 
 
+class TestBatchSyncEndpoint:
+    """Test batch sync endpoint."""
+
+    def test_batch_sync_queues_task(self, client):
+        """Test batch sync queues one Celery task for all proposals."""
+        mock_task = Mock()
+        mock_task.delay.return_value = Mock(id="task-batch-1")
+
+        with patch("offorte_airtable_sync.server.sync_proposals_batch_task", mock_task):
+            response = client.post("/sync/batch", json=[12345, 12346, 12347])
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["proposal_count"] == 3
+        assert data["task_id"] == "task-batch-1"
+        mock_task.delay.assert_called_once_with([12345, 12346, 12347])
+
+    def test_batch_sync_empty_list(self, client):
+        """Test batch sync rejects an empty list."""
+        response = client.post("/sync/batch", json=[])
+
+        assert response.status_code == 400
+
+
 class TestServerLifecycle:
     """Test server startup and shutdown events."""
 
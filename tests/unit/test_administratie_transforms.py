@@ -0,0 +1,49 @@
+"""
+Tests for the STB-ADMINISTRATIE transformers.
+
+Tests cover:
+1. Facturatie - 30/65/5 payment schedule and cent-exact splits
+"""
+
+import pytest
+
+from backend.transformers.administratie_transforms import (
+    transform_proposal_to_administratie,
+    transform_proposal_to_facturatie,
+)
+
+
+def _proposal(total):
+    return {
+        "id": 2025001,
+        "price_total_original": total,
+        "customer": {"name": "Jansen", "street": "Dorpsstraat 1", "zipcode": "1234 AB", "city": "Utrecht"},
+    }
+
+
+class TestFacturatie:
+    """Test the Facturatie records."""
+
+    def test_payment_schedule(self):
+        """Test three invoices split 30/65/5."""
+        invoices = transform_proposal_to_facturatie(_proposal(45000.00))
+
+        assert [inv["Factuur ID"] for inv in invoices] == ["2025001-F1", "2025001-F2", "2025001-F3"]
+        assert [inv["Type Factuur"] for inv in invoices] == ["30% Vooraf", "65% Bij Start", "5% Oplevering"]
+        assert [inv["Bedrag"] for inv in invoices] == [13500.00, 29250.00, 2250.00]
+
+    @pytest.mark.dutch
+    @pytest.mark.parametrize("total", [1000.05, 1000.10, 12345.67])
+    def test_splits_add_up_to_total(self, total):
+        """Test the final invoice takes the remainder, so the cents add up exactly."""
+        invoices = transform_proposal_to_facturatie(_proposal(total))
+
+        assert round(sum(inv["Bedrag"] for inv in invoices), 2) == total
+        assert invoices[0]["Bedrag"] == round(total * 0.30, 2)
+        assert invoices[1]["Bedrag"] == round(total * 0.65, 2)
+
+    def test_administratie_uses_same_splits(self):
+        """Test the combined transform used by the sync service splits the same way."""
+        records = transform_proposal_to_administratie(_proposal(1000.10))
+
+        assert [inv["Bedrag"] for inv in records["facturatie"]] == [300.03, 650.07, 50.0]
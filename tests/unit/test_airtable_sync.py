@@ -0,0 +1,298 @@
+"""
+Tests for the AirtableSync service.
+
+Tests cover:
+1. Record cleaning - empty values and "N.v.t." singleSelect fields
+2. upsert_records - batched PATCH upsert and POST create
+3. Per-record fallback when Airtable rejects a batch
+4. Write retries and per-base request pacing
+"""
+
+import pytest
+import requests
+from unittest.mock import Mock, patch
+
+from backend.core.rate_limit import TokenBucket
+from backend.services.airtable_records import make_record_cleaner
+from backend.services.airtable_sync import AIRTABLE_BATCH_SIZE, AirtableSync
+
+
+def _response(status_code=200, json_data=None):
+    """Mock requests.Response with raise_for_status behaving like the real one."""
+    response = Mock()
+    response.status_code = status_code
+    response.json.return_value = json_data if json_data is not None else {}
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError(
+            f"{status_code} Client Error", response=response
+        )
+    return response
+
+
+@pytest.fixture
+def sync():
+    """AirtableSync with mocked sessions and no request pacing."""
+    service = AirtableSync()
+    service.session = Mock()
+    service.write_session = Mock()
+    service._limiters = {}
+    return service
+
+
+def _klant(i):
+    return {"Opdrachtnummer": f"K{i}", "Klantnaam": f"Klant {i}", "Adres": ""}
+
+
+# ============================================================================
+# Record cleaning
+# ============================================================================
+
+class TestRecordCleaner:
+    """Test the per-table record cleaner."""
+
+    def test_drops_empty_and_none_values(self):
+        """Test empty strings and None are removed, other falsy values kept."""
+        clean = make_record_cleaner(["Klantnaam", "Adres"])
+
+        result = clean({"Klantnaam": "Jansen", "Adres": "", "Telefoon": None, "Aantal": 0})
+
+        assert result == {"Klantnaam": "Jansen", "Aantal": 0}
+
+    def test_nvt_gets_period_for_singleselect_fields(self):
+        """Test "N.v.t" becomes "N.v.t." only for the singleSelect fields that need it."""
+        clean = make_record_cleaner(["Locatie", "Brievenbus", "Type Glas"])
+
+        result = clean({"Locatie": "N.v.t", "Brievenbus": "N.v.t", "Type Glas": "N.v.t"})
+
+        assert result == {"Locatie": "N.v.t.", "Brievenbus": "N.v.t.", "Type Glas": "N.v.t"}
+
+    def test_table_without_nvt_fields_keeps_nvt(self):
+        """Test tables without those fields leave "N.v.t" unchanged."""
+        clean = make_record_cleaner(["Klantnaam"])
+
+        assert clean({"Locatie": "N.v.t"}) == {"Locatie": "N.v.t"}
+
+
+# ============================================================================
+# upsert_records: batched writes
+# ============================================================================
+
+class TestUpsertRecords:
+    """Test batched upserts and creates."""
+
+    def test_upsert_patches_in_batches_of_ten(self, sync):
+        """Test 23 records go out as 3 performUpsert PATCH requests."""
+        sync.write_session.request.side_effect = lambda method, url, json, timeout: _response(
+            json_data={"createdRecords": ["rec"] * len(json["records"]), "updatedRecords": []}
+        )
+
+        stats = sync.upsert_records("klantenportaal", [_klant(i) for i in range(23)])
+
+        assert stats == {"created": 23, "updated": 0, "failed": 0}
+        calls = sync.write_session.request.call_args_list
+        assert [len(c.kwargs["json"]["records"]) for c in calls] == [10, 10, 3]
+        for c in calls:
+            assert c.args[0] == "PATCH"
+            assert c.kwargs["json"]["performUpsert"] == {"fieldsToMergeOn": ["Opdrachtnummer"]}
+        sync.session.request.assert_not_called()
+
+    def test_upsert_counts_created_and_updated(self, sync):
+        """Test stats come from Airtable's createdRecords/updatedRecords."""
+        sync.write_session.request.return_value = _response(
+            json_data={"createdRecords": ["recA"], "updatedRecords": ["recB", "recC"]}
+        )
+
+        stats = sync.upsert_records("klantenportaal", [_klant(i) for i in range(3)])
+
+        assert stats == {"created": 1, "updated": 2, "failed": 0}
+
+    def test_records_are_cleaned_before_sending(self, sync):
+        """Test empty values are stripped from the batch payload."""
+        sync.write_session.request.return_value = _response(
+            json_data={"createdRecords": ["recA"], "updatedRecords": []}
+        )
+
+        sync.upsert_records("klantenportaal", [_klant(1)])
+
+        payload = sync.write_session.request.call_args.kwargs["json"]
+        assert payload["records"] == [{"fields": {"Opdrachtnummer": "K1", "Klantnaam": "Klant 1"}}]
+
+    def test_records_without_key_field_fail(self, sync):
+        """Test records missing the key field are counted as failed, not sent."""
+        sync.write_session.request.return_value = _response(
+            json_data={"createdRecords": ["recA"], "updatedRecords": []}
+        )
+
+        stats = sync.upsert_records("klantenportaal", [_klant(1), {"Klantnaam": "Zonder nummer"}])
+
+        assert stats == {"created": 1, "updated": 0, "failed": 1}
+        assert len(sync.write_session.request.call_args.kwargs["json"]["records"]) == 1
+
+    def test_subproducten_are_always_created(self, sync):
+        """Test Subproducten use a plain POST create without performUpsert."""
+        sync.write_session.request.return_value = _response(json_data={"records": ["recA", "recB"]})
+        records = [
+            {"Subproduct ID": "E1-S1", "Element ID Ref": "E1"},
+            {"Subproduct ID": "E1-S2", "Element ID Ref": "E1"},
+        ]
+
+        stats = sync.upsert_records("subproducten", records)
+
+        assert stats == {"created": 2, "updated": 0, "failed": 0}
+        method = sync.write_session.request.call_args.args[0]
+        assert method == "POST"
+        assert "performUpsert" not in sync.write_session.request.call_args.kwargs["json"]
+
+
+# ============================================================================
+# upsert_records: per-record fallback
+# ============================================================================
+
+class TestUpsertFallback:
+    """Test the per-record fallback for a rejected batch."""
+
+    def test_rejected_batch_retried_per_record(self, sync):
+        """Test a 422 batch is retried record by record, so one bad record fails alone."""
+        def write(method, url, json, timeout):
+            if "records" in json:
+                return _response(422)
+            if json["fields"]["Opdrachtnummer"] == "K1":
+                return _response(422)
+            return _response(json_data={"id": "recNew"})
+
+        sync.write_session.request.side_effect = write
+        # Small table: one page of existing records
+        sync.session.request.return_value = _response(json_data={"records": []})
+
+        stats = sync.upsert_records("klantenportaal", [_klant(i) for i in range(3)])
+
+        assert stats == {"created": 2, "updated": 0, "failed": 1}
+
+    def test_fallback_indexes_small_table_once(self, sync):
+        """Test a one-page table is listed once instead of queried per record."""
+        sync.write_session.request.side_effect = lambda method, url, json, timeout: (
+            _response(422) if "records" in json else _response(json_data={"id": "recNew"})
+        )
+        sync.session.request.return_value = _response(json_data={
+            "records": [{"id": "recK0", "fields": {"Opdrachtnummer": "K0"}}]
+        })
+
+        sync.upsert_records("klantenportaal", [_klant(i) for i in range(AIRTABLE_BATCH_SIZE + 5)])
+
+        # One list request for both rejected batches, no filterByFormula lookups
+        assert sync.session.request.call_count == 1
+        assert "pageSize" in sync.session.request.call_args.kwargs["params"]
+
+        # The existing record is updated in place, the others created
+        writes = [c for c in sync.write_session.request.call_args_list if "fields" in c.kwargs["json"]]
+        patched = [c.args[1] for c in writes if c.args[0] == "PATCH"]
+        assert len(patched) == 1 and patched[0].endswith("/recK0")
+        assert sum(1 for c in writes if c.args[0] == "POST") == AIRTABLE_BATCH_SIZE + 4
+
+    def test_fallback_queries_records_of_large_table(self, sync):
+        """Test a table with more pages than lookups is not indexed."""
+        sync.write_session.request.side_effect = lambda method, url, json, timeout: (
+            _response(422) if "records" in json else _response(json_data={"id": "recNew"})
+        )
+
+        def read(method, url, params, timeout):
+            if "pageSize" in params:
+                return _response(json_data={"records": [], "offset": "next"})
+            return _response(json_data={"records": []})
+
+        sync.session.request.side_effect = read
+
+        stats = sync.upsert_records("klantenportaal", [_klant(i) for i in range(3)])
+
+        assert stats["created"] == 3
+        params = [c.kwargs["params"] for c in sync.session.request.call_args_list]
+        assert sum(1 for p in params if "pageSize" in p) == 2  # gave up after len(batch) - 1 pages
+        assert sum(1 for p in params if "filterByFormula" in p) == 3
+
+    def test_single_record_batch_skips_index(self, sync):
+        """Test one rejected record is looked up directly, without listing the table."""
+        sync.write_session.request.side_effect = lambda method, url, json, timeout: (
+            _response(422) if "records" in json else _response(json_data={"id": "recNew"})
+        )
+        sync.session.request.return_value = _response(json_data={"records": [{"id": "recK0"}]})
+
+        stats = sync.upsert_records("klantenportaal", [_klant(0)])
+
+        assert stats["created"] == 1
+        assert "filterByFormula" in sync.session.request.call_args.kwargs["params"]
+        assert sync.write_session.request.call_args.args[1].endswith("/recK0")
+
+    def test_rejected_subproducten_batch_created_per_record(self, sync):
+        """Test the Subproducten fallback creates records without any lookup."""
+        sync.write_session.request.side_effect = lambda method, url, json, timeout: (
+            _response(422) if "records" in json else _response(json_data={"id": "recNew"})
+        )
+
+        stats = sync.upsert_records("subproducten", [{"Subproduct ID": "E1-S1"}, {"Subproduct ID": "E1-S2"}])
+
+        assert stats == {"created": 2, "updated": 0, "failed": 0}
+        sync.session.request.assert_not_called()
+
+    def test_network_error_fails_batch(self, sync):
+        """Test a non-HTTP error fails the batch without a per-record retry."""
+        sync.write_session.request.side_effect = requests.exceptions.ConnectionError("reset")
+
+        stats = sync.upsert_records("klantenportaal", [_klant(i) for i in range(3)])
+
+        assert stats == {"created": 0, "updated": 0, "failed": 3}
+        assert sync.write_session.request.call_count == 1
+
+
+# ============================================================================
+# Retries and pacing
+# ============================================================================
+
+class TestRetryAndPacing:
+    """Test write retries and the per-base rate limit."""
+
+    def test_writes_retry_only_on_429(self):
+        """Test writes are retried on 429 but not on 5xx (they may have been applied)."""
+        service = AirtableSync()
+        retry = service.write_session.get_adapter("https://api.airtable.com").max_retries
+
+        assert retry.is_retry("POST", 429)
+        assert retry.is_retry("PATCH", 429, has_retry_after=True)
+        assert not retry.is_retry("POST", 500)
+        assert not retry.is_retry("PATCH", 503, has_retry_after=True)
+
+    def test_reads_retry_on_429_and_5xx(self):
+        """Test reads keep retrying on rate limits and server errors."""
+        service = AirtableSync()
+        retry = service.session.get_adapter("https://api.airtable.com").max_retries
+
+        assert retry.is_retry("GET", 429)
+        assert retry.is_retry("GET", 503)
+
+    def test_requests_take_a_token_from_their_base(self, sync):
+        """Test every request waits on the bucket of the base it goes to."""
+        sales, admin = Mock(), Mock()
+        sync._limiters = {"appSales": sales, "appAdmin": admin}
+        sync.write_session.request.return_value = _response()
+
+        sync._request("POST", "appSales", "https://api.airtable.com/v0/appSales/T", json={})
+        sync._request("GET", "appAdmin", "https://api.airtable.com/v0/appAdmin/T")
+
+        sales.acquire.assert_called_once()
+        admin.acquire.assert_called_once()
+
+    def test_token_bucket_spaces_calls(self):
+        """Test the bucket allows one call immediately, then one per 1/rate seconds."""
+        clock = {"now": 100.0}
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock["now"] += seconds
+
+        with patch("backend.core.rate_limit.time.monotonic", side_effect=lambda: clock["now"]), \
+                patch("backend.core.rate_limit.time.sleep", side_effect=sleep):
+            bucket = TokenBucket(rate=5)
+            for _ in range(3):
+                bucket.acquire()
+
+        assert sleeps == pytest.approx([0.2, 0.2])
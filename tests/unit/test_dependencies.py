@@ -10,10 +10,9 @@ Tests cover:
 
 import pytest
 import httpx
-from unittest.mock import AsyncMock, patch
+from unittest.mock import patch
 
-from offorte_airtable_sync.dependencies import AgentDependencies
-from offorte_airtable_sync.settings import Settings
+from backend.core.dependencies import AgentDependencies
 
 
 class TestAgentDependencies:
@@ -28,9 +27,9 @@ class TestAgentDependencies:
 
     def test_dependencies_base_ids(self, test_deps):
         """Test all three Airtable base IDs are set."""
-        assert test_deps.airtable_base_admin == "appTestAdmin123"
-        assert test_deps.airtable_base_sales == "appTestSales123"
-        assert test_deps.airtable_base_tech == "appTestTech123"
+        assert test_deps.airtable_base_stb_administratie == "appTestAdmin123"
+        assert test_deps.airtable_base_stb_sales == "appTestSales123"
+        assert test_deps.airtable_base_stb_productie == "appTestTech123"
 
     def test_dependencies_configuration(self, test_deps):
         """Test configuration values."""
@@ -65,9 +64,41 @@ class TestAgentDependencies:
 
     def test_http_client_connection_limits(self, test_deps):
         """Test HTTP client connection limits."""
-        client = test_deps.http_client
-        assert isinstance(client._limits, httpx.Limits)
-        assert client._limits.max_connections == 100
+        with patch("backend.core.dependencies.httpx.AsyncClient") as client_cls:
+            _ = test_deps.http_client
+
+        limits = client_cls.call_args.kwargs["limits"]
+        assert isinstance(limits, httpx.Limits)
+        assert limits.max_connections == 100
+
+    def test_airtable_api_lazy_init(self, test_deps):
+        """Test Airtable API client is lazy initialized and shared."""
+        assert test_deps._airtable_api is None
+
+        api = test_deps.airtable_api
+        assert api.api_key == test_deps.airtable_api_key
+        assert api.timeout == (5, test_deps.timeout)
+
+        # Second access returns same instance
+        assert test_deps.airtable_api is api
+
+    def test_airtable_api_connection_pool(self, test_deps):
+        """Test Airtable session reuses a pooled adapter with 429 retries."""
+        adapter = test_deps.airtable_api.session.get_adapter("https://api.airtable.com")
+
+        assert adapter._pool_maxsize == 50
+        assert 429 in adapter.max_retries.status_forcelist
+
+    def test_airtable_limiter_lazy_init(self, test_deps):
+        """Test Airtable rate limiter is lazy initialized and shared."""
+        assert test_deps._airtable_limiter is None
+
+        limiter = test_deps.airtable_limiter
+        assert limiter.max_rate == test_deps.airtable_rate_limit
+        assert limiter.time_period == 1
+
+        # Second access returns same instance
+        assert test_deps.airtable_limiter is limiter
 
     @pytest.mark.asyncio
     async def test_cleanup_with_client(self, test_deps):
@@ -96,9 +127,9 @@ class TestAgentDependencies:
         assert deps.offorte_account_name == test_settings.offorte_account_name
         assert deps.offorte_base_url == test_settings.offorte_base_url
         assert deps.airtable_api_key == test_settings.airtable_api_key
-        assert deps.airtable_base_admin == test_settings.airtable_base_administration
-        assert deps.airtable_base_sales == test_settings.airtable_base_sales_review
-        assert deps.airtable_base_tech == test_settings.airtable_base_technisch
+        assert deps.airtable_base_stb_administratie == test_settings.airtable_base_stb_administratie
+        assert deps.airtable_base_stb_sales == test_settings.airtable_base_stb_sales
+        assert deps.airtable_base_stb_productie == test_settings.airtable_base_stb_productie
         assert deps.max_retries == test_settings.max_retries
         assert deps.timeout == test_settings.timeout_seconds
 
@@ -125,9 +156,9 @@ class TestAgentDependencies:
             offorte_base_url="https://direct.com",
             airtable_api_key="direct_airtable",
             webhook_secret="direct_secret",
-            airtable_base_admin="appDirect1",
-            airtable_base_sales="appDirect2",
-            airtable_base_tech="appDirect3",
+            airtable_base_stb_administratie="appDirect1",
+            airtable_base_stb_sales="appDirect2",
+            airtable_base_stb_productie="appDirect3",
             max_retries=2,
             timeout=60,
             proposal_id=777,
@@ -146,9 +177,9 @@ class TestAgentDependencies:
             offorte_base_url="https://test.com",
             airtable_api_key="key",
             webhook_secret="secret",
-            airtable_base_admin="base1",
-            airtable_base_sales="base2",
-            airtable_base_tech="base3"
+            airtable_base_stb_administratie="base1",
+            airtable_base_stb_sales="base2",
+            airtable_base_stb_productie="base3"
             # job_id and proposal_id not provided
         )
 
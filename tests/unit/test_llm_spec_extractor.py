@@ -0,0 +1,310 @@
+"""
+Tests for the LLM spec extractor.
+
+Tests cover:
+1. Batching - several pricetables in one LLM request
+2. Per-product fallback for failed, invalid or reordered batch results
+3. Dedupe of identical pricetables and cache hits
+4. SpecCache keys and expiry
+5. Regex pre-extraction (gelijksluitend)
+"""
+
+import re
+import pytest
+import orjson
+from unittest.mock import MagicMock, patch
+
+from backend.core.settings import settings
+from backend.core.spec_cache import SpecCache
+from backend.transformers.llm_spec_extractor import LLM_BATCH_SIZE, LLMSpecExtractor
+
+
+def _pricetable(name, *subproducts):
+    """Pricetable with a main row and optional subproduct rows."""
+    rows = [{"content": f"<p>{name}</p>"}]
+    rows.extend({"content": f"<p>{text}</p>"} for text in subproducts)
+    return {"rows": rows}
+
+
+def _tool_response(arguments):
+    """Mock chat completion with one forced tool call."""
+    response = MagicMock()
+    response.usage = None
+    response.choices[0].message.tool_calls[0].function.arguments = orjson.dumps(arguments)
+    return response
+
+
+def _product_name(text):
+    """First main product line of one product's part of the user message."""
+    return text.split("MAIN PRODUCT:\n", 1)[1].split("\n", 1)[0]
+
+
+def _answer(request):
+    """Reply to a request with kleur = product name, batched or single."""
+    user = request["messages"][1]["content"]
+    if request["tools"][0]["function"]["name"] == "extract_specs_batch":
+        blocks = re.split(r"^PRODUCT \d+:$", user, flags=re.MULTILINE)[1:]
+        return {"results": [
+            {"product": i, "kleur": _product_name(block)} for i, block in enumerate(blocks, 1)
+        ]}
+    return {"kleur": _product_name(user)}
+
+
+@pytest.fixture
+def extractor(tmp_path):
+    """LLMSpecExtractor with a mocked OpenAI client and a temporary disk cache."""
+    with patch.object(settings, "llm_cache_dir", str(tmp_path)), patch("openai.OpenAI"):
+        instance = LLMSpecExtractor()
+    instance.client.chat.completions.create.side_effect = (
+        lambda **request: _tool_response(_answer(request))
+    )
+    yield instance
+    instance.executor.shutdown()
+    instance.http_client.close()
+
+
+def _calls(extractor):
+    return extractor.client.chat.completions.create.call_args_list
+
+
+# ============================================================================
+# Batching
+# ============================================================================
+
+class TestBatching:
+    """Test packing pricetables into shared requests."""
+
+    def test_pricetables_share_one_request(self, extractor):
+        """Test three pricetables are extracted with one batched request, in order."""
+        pricetables = [_pricetable(f"Raam {c}") for c in "ABC"]
+
+        specs = extractor.extract_specs_from_pricetables(pricetables, ["Raam"] * 3)
+
+        assert len(_calls(extractor)) == 1
+        assert _calls(extractor)[0].kwargs["tools"][0]["function"]["name"] == "extract_specs_batch"
+        assert [s["kleur"] for s in specs] == ["Raam A", "Raam B", "Raam C"]
+        assert all("product" not in s for s in specs)
+
+    def test_large_proposal_is_split_into_batches(self, extractor):
+        """Test more than LLM_BATCH_SIZE pricetables use several requests."""
+        pricetables = [_pricetable(f"Deur {i}") for i in range(LLM_BATCH_SIZE + 2)]
+
+        specs = extractor.extract_specs_from_pricetables(pricetables, ["Deur"] * len(pricetables))
+
+        assert len(_calls(extractor)) == 2
+        assert [s["kleur"] for s in specs] == [f"Deur {i}" for i in range(LLM_BATCH_SIZE + 2)]
+
+    def test_single_pricetable_uses_single_tool(self, extractor):
+        """Test a batch of one is sent as a plain extract_specs request."""
+        specs = extractor.extract_specs_from_pricetables([_pricetable("Raam A")], ["Raam"])
+
+        assert _calls(extractor)[0].kwargs["tools"][0]["function"]["name"] == "extract_specs"
+        assert specs == [{"kleur": "Raam A"}]
+
+    def test_empty_pricetables_skip_llm(self, extractor):
+        """Test pricetables without rows or visible text never reach the LLM."""
+        specs = extractor.extract_specs_from_pricetables(
+            [{"rows": []}, {"rows": [{"content": "<p> </p>"}]}, {"rows": [{"content": "<p>&nbsp;-</p>"}]}],
+            [None, None, None]
+        )
+
+        assert specs == [{}, {}, {}]
+        assert not _calls(extractor)
+
+
+# ============================================================================
+# Batch fallback
+# ============================================================================
+
+class TestBatchFallback:
+    """Test falling back to per-product requests."""
+
+    def _batch_reply(self, extractor, results):
+        """Answer batched requests with results, single requests normally."""
+        def reply(**request):
+            if request["tools"][0]["function"]["name"] == "extract_specs_batch":
+                return _tool_response({"results": results})
+            return _tool_response(_answer(request))
+        extractor.client.chat.completions.create.side_effect = reply
+
+    def test_failed_batch_falls_back_per_product(self, extractor):
+        """Test an API error on the batch extracts every product on its own."""
+        def reply(**request):
+            if request["tools"][0]["function"]["name"] == "extract_specs_batch":
+                raise RuntimeError("timeout")
+            return _tool_response(_answer(request))
+        extractor.client.chat.completions.create.side_effect = reply
+
+        specs = extractor.extract_specs_from_pricetables([_pricetable("A"), _pricetable("B")], [None, None])
+
+        assert [s["kleur"] for s in specs] == ["A", "B"]
+        assert len(_calls(extractor)) == 3
+
+    def test_count_mismatch_falls_back_per_product(self, extractor):
+        """Test a results list of the wrong length is not used at all."""
+        self._batch_reply(extractor, [{"product": 1, "kleur": "wrong"}])
+
+        specs = extractor.extract_specs_from_pricetables([_pricetable("A"), _pricetable("B")], [None, None])
+
+        assert [s["kleur"] for s in specs] == ["A", "B"]
+        assert len(_calls(extractor)) == 3
+
+    def test_null_entry_falls_back_for_that_product(self, extractor):
+        """Test a null entry only re-extracts its own product."""
+        self._batch_reply(extractor, [None, {"product": 2, "kleur": "B"}])
+
+        specs = extractor.extract_specs_from_pricetables([_pricetable("A"), _pricetable("B")], [None, None])
+
+        assert [s["kleur"] for s in specs] == ["A", "B"]
+        single = [c for c in _calls(extractor) if c.kwargs["tools"][0]["function"]["name"] == "extract_specs"]
+        assert len(single) == 1
+        assert _product_name(single[0].kwargs["messages"][1]["content"]) == "A"
+
+    def test_reordered_results_fall_back(self, extractor):
+        """Test results with the wrong PRODUCT number are not given to another pricetable."""
+        self._batch_reply(extractor, [
+            {"product": 2, "kleur": "B"},
+            {"product": 1, "kleur": "A"},
+            {"product": 3, "kleur": "C"},
+        ])
+
+        specs = extractor.extract_specs_from_pricetables(
+            [_pricetable("A"), _pricetable("B"), _pricetable("C")], [None] * 3
+        )
+
+        assert [s["kleur"] for s in specs] == ["A", "B", "C"]
+        assert len(_calls(extractor)) == 3  # batch + products 1 and 2
+
+    def test_failed_single_extraction_keeps_known_fields(self, extractor):
+        """Test a failed request still returns the regex-extracted fields, uncached."""
+        extractor.client.chat.completions.create.side_effect = RuntimeError("down")
+        pricetable = _pricetable("Voordeur (1000x2100mm)")
+
+        specs = extractor.extract_specs_from_pricetable(pricetable, "Deur")
+
+        assert specs["breedte"] == 1000 and specs["hoogte"] == 2100
+        extractor.extract_specs_from_pricetable(pricetable, "Deur")
+        assert len(_calls(extractor)) == 2
+
+
+# ============================================================================
+# Dedupe and caching
+# ============================================================================
+
+class TestDedupeAndCache:
+    """Test identical pricetables and cached extractions."""
+
+    def test_identical_pricetables_extracted_once(self, extractor):
+        """Test repeated pricetables become one LLM product and get separate copies."""
+        hordeur = _pricetable("Hordeur", "Kleur: wit")
+        pricetables = [hordeur, _pricetable("Raam A"), hordeur, hordeur]
+
+        specs = extractor.extract_specs_from_pricetables(pricetables, ["Deur", "Raam", "Deur", "Deur"])
+
+        assert len(_calls(extractor)) == 1
+        user = _calls(extractor)[0].kwargs["messages"][1]["content"]
+        assert len(re.findall(r"^PRODUCT \d+:$", user, flags=re.MULTILINE)) == 2
+        assert specs[0] == specs[2] == specs[3]
+        assert specs[0] is not specs[2]
+
+    def test_cache_hit_skips_llm(self, extractor):
+        """Test a second extraction of the same pricetable is served from cache."""
+        pricetable = _pricetable("Raam A")
+
+        first = extractor.extract_specs_from_pricetable(pricetable, "Raam")
+        second = extractor.extract_specs_from_pricetable(pricetable, "Raam")
+
+        assert first == second
+        assert len(_calls(extractor)) == 1
+
+    def test_disk_cache_survives_new_extractor(self, extractor, tmp_path):
+        """Test a fresh extractor (empty memory cache) reads the disk cache."""
+        extractor.extract_specs_from_pricetable(_pricetable("Raam A"), "Raam")
+
+        with patch.object(settings, "llm_cache_dir", str(tmp_path)), patch("openai.OpenAI"):
+            fresh = LLMSpecExtractor()
+        specs = fresh.extract_specs_from_pricetable(_pricetable("Raam A"), "Raam")
+
+        assert specs == {"kleur": "Raam A"}
+        fresh.client.chat.completions.create.assert_not_called()
+        fresh.executor.shutdown()
+        fresh.http_client.close()
+
+    def test_element_type_is_part_of_cache_key(self, extractor):
+        """Test the same HTML with another element type misses the cache."""
+        extractor.extract_specs_from_pricetable(_pricetable("Kozijn"), "Raam")
+        extractor.extract_specs_from_pricetable(_pricetable("Kozijn"), "Deur")
+
+        assert len(_calls(extractor)) == 2
+
+    def test_cached_specs_are_copies(self, extractor):
+        """Test changing returned specs does not change the cache."""
+        pricetable = _pricetable("Raam A")
+        extractor.extract_specs_from_pricetable(pricetable, "Raam")["kleur"] = "changed"
+
+        assert extractor.extract_specs_from_pricetable(pricetable, "Raam") == {"kleur": "Raam A"}
+
+
+class TestSpecCache:
+    """Test the on-disk SpecCache."""
+
+    def test_key_is_stable_and_input_sensitive(self):
+        """Test equal parts give equal keys and any changed part a new key."""
+        key = SpecCache.make_key("3", "gpt-4o", "Raam", "<p>A</p>")
+
+        assert key == SpecCache.make_key("3", "gpt-4o", "Raam", "<p>A</p>")
+        assert key != SpecCache.make_key("2", "gpt-4o", "Raam", "<p>A</p>")
+        assert key != SpecCache.make_key("3", "gpt-4o-mini", "Raam", "<p>A</p>")
+        assert key != SpecCache.make_key("3", "gpt-4o", "Raam", "<p>B</p>")
+
+    def test_key_is_length_prefixed(self):
+        """Test moving text between parts changes the key."""
+        assert SpecCache.make_key("ab", "c") != SpecCache.make_key("a", "bc")
+        assert SpecCache.make_key("a\nb") != SpecCache.make_key("a", "b")
+
+    def test_get_returns_stored_specs(self, tmp_path):
+        """Test set then get round-trips the specs."""
+        cache = SpecCache(str(tmp_path))
+        cache.set("key", {"kleur": "RAL 9010", "breedte": 1000})
+
+        assert cache.get("key") == {"kleur": "RAL 9010", "breedte": 1000}
+        assert cache.get("other") is None
+
+    def test_expired_entries_are_ignored(self, tmp_path):
+        """Test entries older than the TTL are treated as missing."""
+        cache = SpecCache(str(tmp_path), ttl_seconds=60)
+        with patch("backend.core.spec_cache.time.time", return_value=1000.0):
+            cache.set("key", {"kleur": "wit"})
+        with patch("backend.core.spec_cache.time.time", return_value=1059.0):
+            assert cache.get("key") == {"kleur": "wit"}
+        with patch("backend.core.spec_cache.time.time", return_value=1061.0):
+            assert cache.get("key") is None
+
+
+# ============================================================================
+# Regex pre-extraction
+# ============================================================================
+
+class TestPreExtract:
+    """Test the fields extracted before the LLM call."""
+
+    def test_gelijksluitend_sets_ja(self, extractor):
+        """Test a positive mention sets cilinder_gelijksluitend."""
+        known = extractor._pre_extract("Voordeur", "Cilinder gelijksluitend uitgevoerd")
+
+        assert known["cilinder_gelijksluitend"] == "Ja"
+
+    @pytest.mark.parametrize("text", [
+        "Cilinders niet gelijksluitend",
+        "Geen gelijksluitende cilinders",
+        "NIET-gelijksluitend",
+    ])
+    def test_negated_gelijksluitend_left_to_llm(self, extractor, text):
+        """Test a negated mention does not set Ja."""
+        assert "cilinder_gelijksluitend" not in extractor._pre_extract("Voordeur", text)
+
+    def test_dimensions_extracted(self, extractor):
+        """Test dimensions in the product name are pre-extracted."""
+        known = extractor._pre_extract("Voordeur (1000x2100mm)", "")
+
+        assert known["geoffreerde_afmetingen"] == "1000x2100 mm"
@@ -13,7 +13,7 @@ import os
 from unittest.mock import patch
 from pydantic import ValidationError
 
-from offorte_airtable_sync.settings import Settings, load_settings
+from backend.core.settings import Settings, load_settings
 
 
 class TestSettings:
@@ -37,18 +37,22 @@ class TestSettings:
         assert test_settings.max_retries == 3
         assert test_settings.timeout_seconds == 30
 
-    def test_settings_missing_required_field(self):
+    def test_settings_missing_required_field(self, monkeypatch):
         """Test that missing required fields raise ValidationError."""
+        monkeypatch.delenv("AIRTABLE_BASE_STB_SALES", raising=False)
+
         with pytest.raises(ValidationError) as exc_info:
             Settings(
+                _env_file=None,
                 offorte_api_key="test",
                 offorte_account_name="test",
                 airtable_api_key="test",
-                # Missing llm_api_key
+                airtable_base_stb_administratie="base1",
+                # Missing airtable_base_stb_sales
                 webhook_secret="test"
             )
 
-        assert "llm_api_key" in str(exc_info.value)
+        assert "airtable_base_stb_sales" in str(exc_info.value)
 
     def test_settings_case_insensitive(self):
         """Test that environment variables are case insensitive."""
@@ -58,9 +62,9 @@ class TestSettings:
             "AIRTABLE_API_KEY": "key2",
             "LLM_API_KEY": "key3",
             "WEBHOOK_SECRET": "secret1",
-            "airtable_base_administration": "base1",
-            "airtable_base_sales_review": "base2",
-            "airtable_base_technisch": "base3"
+            "airtable_base_stb_administratie": "base1",
+            "airtable_base_stb_sales": "base2",
+            "airtable_base_stb_productie": "base3"
         }):
             settings = Settings()
             assert settings.offorte_api_key == "key1"
@@ -74,9 +78,9 @@ class TestSettings:
             airtable_api_key="test",
             llm_api_key="test",
             webhook_secret="test",
-            airtable_base_administration="base1",
-            airtable_base_sales_review="base2",
-            airtable_base_technisch="base3",
+            airtable_base_stb_administratie="base1",
+            airtable_base_stb_sales="base2",
+            airtable_base_stb_productie="base3",
             unknown_field="should_be_ignored"  # Extra field
         )
         assert not hasattr(settings, "unknown_field")
@@ -87,9 +91,9 @@ class TestSettings:
             "OFFORTE_API_KEY": "test_key",
             "OFFORTE_ACCOUNT_NAME": "test_account",
             "AIRTABLE_API_KEY": "test_airtable",
-            "AIRTABLE_BASE_ADMINISTRATION": "appAdmin",
-            "AIRTABLE_BASE_SALES_REVIEW": "appSales",
-            "AIRTABLE_BASE_TECHNISCH": "appTech",
+            "AIRTABLE_BASE_STB_ADMINISTRATIE": "appAdmin",
+            "AIRTABLE_BASE_STB_SALES": "appSales",
+            "AIRTABLE_BASE_STB_PRODUCTIE": "appTech",
             "LLM_API_KEY": "test_llm",
             "WEBHOOK_SECRET": "test_secret"
         }
@@ -97,7 +101,7 @@ class TestSettings:
         for key, value in env_vars.items():
             monkeypatch.setenv(key, value)
 
-        with patch("offorte_airtable_sync.settings.load_dotenv"):
+        with patch("backend.core.settings.load_dotenv"):
             settings = load_settings()
             assert settings.offorte_api_key == "test_key"
             assert settings.airtable_api_key == "test_airtable"
@@ -106,7 +110,7 @@ class TestSettings:
         """Test load_settings with missing Offorte API key."""
         monkeypatch.delenv("OFFORTE_API_KEY", raising=False)
 
-        with patch("offorte_airtable_sync.settings.load_dotenv"):
+        with patch("backend.core.settings.load_dotenv"):
             with pytest.raises(ValueError) as exc_info:
                 load_settings()
 
@@ -119,9 +123,9 @@ class TestSettings:
             "OFFORTE_ACCOUNT_NAME": "test",
             "LLM_API_KEY": "test",
             "WEBHOOK_SECRET": "test",
-            "AIRTABLE_BASE_ADMINISTRATION": "base1",
-            "AIRTABLE_BASE_SALES_REVIEW": "base2",
-            "AIRTABLE_BASE_TECHNISCH": "base3"
+            "AIRTABLE_BASE_STB_ADMINISTRATIE": "base1",
+            "AIRTABLE_BASE_STB_SALES": "base2",
+            "AIRTABLE_BASE_STB_PRODUCTIE": "base3"
         }
 
         for key, value in env_vars.items():
@@ -129,21 +133,21 @@ class TestSettings:
 
         monkeypatch.delenv("AIRTABLE_API_KEY", raising=False)
 
-        with patch("offorte_airtable_sync.settings.load_dotenv"):
+        with patch("backend.core.settings.load_dotenv"):
             with pytest.raises(ValueError) as exc_info:
                 load_settings()
 
             assert "AIRTABLE_API_KEY" in str(exc_info.value)
 
-    def test_load_settings_missing_llm_key(self, monkeypatch):
-        """Test load_settings with missing LLM API key."""
+    def test_load_settings_without_llm_key(self, monkeypatch, tmp_path):
+        """Test load_settings succeeds without an LLM API key (only agent features need it)."""
+        monkeypatch.chdir(tmp_path)  # no .env providing one
         env_vars = {
             "OFFORTE_API_KEY": "test",
             "OFFORTE_ACCOUNT_NAME": "test",
             "AIRTABLE_API_KEY": "test",
-            "AIRTABLE_BASE_ADMINISTRATION": "base1",
-            "AIRTABLE_BASE_SALES_REVIEW": "base2",
-            "AIRTABLE_BASE_TECHNISCH": "base3",
+            "AIRTABLE_BASE_STB_ADMINISTRATIE": "base1",
+            "AIRTABLE_BASE_STB_SALES": "base2",
             "WEBHOOK_SECRET": "test"
         }
 
@@ -152,11 +156,10 @@ class TestSettings:
 
         monkeypatch.delenv("LLM_API_KEY", raising=False)
 
-        with patch("offorte_airtable_sync.settings.load_dotenv"):
-            with pytest.raises(ValueError) as exc_info:
-                load_settings()
+        with patch("backend.core.settings.load_dotenv"):
+            settings = load_settings()
 
-            assert "LLM_API_KEY" in str(exc_info.value)
+        assert settings.llm_api_key == "not-configured"
 
     def test_settings_redis_url_default(self, test_settings):
         """Test Redis URL has correct default."""
@@ -182,6 +185,6 @@ class TestSettings:
 
     def test_settings_airtable_bases(self, test_settings):
         """Test all three Airtable bases are configured."""
-        assert test_settings.airtable_base_administration == "appTestAdmin123"
-        assert test_settings.airtable_base_sales_review == "appTestSales123"
-        assert test_settings.airtable_base_technisch == "appTestTech123"
+        assert test_settings.airtable_base_stb_administratie == "appTestAdmin123"
+        assert test_settings.airtable_base_stb_sales == "appTestSales123"
+        assert test_settings.airtable_base_stb_productie == "appTestTech123"
@@ -14,10 +14,12 @@ import pytest
 import json
 import hashlib
 import hmac
-from unittest.mock import AsyncMock, Mock, patch
+import httpx
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, Mock, PropertyMock, patch
 from pydantic_ai import RunContext
 
-from offorte_airtable_sync.tools import (
+from backend.agent.tools import (
     validate_webhook,
     fetch_proposal_data,
     parse_construction_elements,
@@ -37,66 +39,116 @@ class TestValidateWebhook:
     def test_validate_webhook_valid_signature(self, mock_webhook_payload):
         """Test webhook validation with valid signature."""
         secret = "test_secret_key"
-        payload_str = json.dumps(mock_webhook_payload, sort_keys=True)
+        raw_body = json.dumps(mock_webhook_payload).encode()
         signature = hmac.new(
             secret.encode(),
-            payload_str.encode(),
+            raw_body,
             hashlib.sha256
         ).hexdigest()
 
-        result = validate_webhook(mock_webhook_payload, signature, secret)
+        result = validate_webhook(raw_body, signature, secret)
 
         assert result["valid"] is True
         assert result["event_type"] == "proposal_won"
         assert result["proposal_id"] == 12345
         assert result["timestamp"] == "2025-01-15 14:30:00"
 
+    def test_validate_webhook_uppercase_hex_signature(self, mock_webhook_payload):
+        """Test signature comparison is on digest bytes, not hex case."""
+        secret = "test_secret_key"
+        raw_body = json.dumps(mock_webhook_payload).encode()
+        signature = hmac.new(secret.encode(), raw_body, hashlib.sha256).hexdigest().upper()
+
+        result = validate_webhook(raw_body, signature, secret)
+
+        assert result["valid"] is True
+
     def test_validate_webhook_invalid_signature(self, mock_webhook_payload):
         """Test webhook validation with invalid signature."""
         secret = "test_secret_key"
-        invalid_signature = "invalid_signature_12345"
+        invalid_signature = "0" * 64
+        raw_body = json.dumps(mock_webhook_payload).encode()
 
-        result = validate_webhook(mock_webhook_payload, invalid_signature, secret)
+        result = validate_webhook(raw_body, invalid_signature, secret)
 
         assert result["valid"] is False
         assert "error" in result
         assert result["error"] == "Invalid signature"
 
+    @pytest.mark.parametrize("signature", [
+        "invalid_signature_12345",
+        "a" * 63,
+        "g" * 64,
+        "a" * 10_000,
+    ])
+    def test_validate_webhook_malformed_signature(self, mock_webhook_payload, signature):
+        """Test signatures that cannot be a hex SHA-256 digest are rejected early."""
+        raw_body = json.dumps(mock_webhook_payload).encode()
+
+        result = validate_webhook(raw_body, signature, "test_secret_key")
+
+        assert result["valid"] is False
+        assert result["error"] == "Malformed signature"
+
     def test_validate_webhook_wrong_secret(self, mock_webhook_payload):
         """Test webhook validation with wrong secret."""
         secret = "correct_secret"
         wrong_secret = "wrong_secret"
+        raw_body = json.dumps(mock_webhook_payload).encode()
 
         # Generate signature with wrong secret
-        payload_str = json.dumps(mock_webhook_payload, sort_keys=True)
         signature = hmac.new(
             wrong_secret.encode(),
-            payload_str.encode(),
+            raw_body,
             hashlib.sha256
         ).hexdigest()
 
-        result = validate_webhook(mock_webhook_payload, signature, secret)
+        result = validate_webhook(raw_body, signature, secret)
+
+        assert result["valid"] is False
+
+    def test_validate_webhook_signs_raw_body(self, mock_webhook_payload):
+        """Test signature is checked against the raw bytes, not a re-serialization."""
+        secret = "test_secret_key"
+        raw_body = json.dumps(mock_webhook_payload, indent=2).encode()
+
+        # Signature over a canonicalized body must not match the bytes actually sent
+        canonical = json.dumps(mock_webhook_payload, sort_keys=True).encode()
+        signature = hmac.new(secret.encode(), canonical, hashlib.sha256).hexdigest()
+
+        result = validate_webhook(raw_body, signature, secret)
 
         assert result["valid"] is False
 
     def test_validate_webhook_malformed_payload(self):
         """Test webhook validation with malformed payload."""
         secret = "test_secret"
-        payload = {"incomplete": "data"}  # Missing required fields
+        raw_body = b'{"incomplete": "data"}'  # Missing required fields
         signature = "any_signature"
 
-        result = validate_webhook(payload, signature, secret)
+        result = validate_webhook(raw_body, signature, secret)
 
         # Should handle gracefully
         assert "valid" in result
 
+    def test_validate_webhook_invalid_json(self):
+        """Test webhook validation with a correctly signed but non-JSON body."""
+        secret = "test_secret"
+        raw_body = b"not json"
+        signature = hmac.new(secret.encode(), raw_body, hashlib.sha256).hexdigest()
+
+        result = validate_webhook(raw_body, signature, secret)
+
+        assert result["valid"] is False
+        assert "error" in result
+
     def test_validate_webhook_empty_payload(self):
         """Test webhook validation with empty payload."""
         secret = "test_secret"
-        payload = {}
+        raw_body = b""
         signature = "any_signature"
 
-        result = validate_webhook(payload, signature, secret)
+        result = validate_webhook(raw_body, signature, secret)
 
         assert result["valid"] is False
 
@@ -105,19 +157,19 @@ class TestValidateWebhook:
         """Test that signature comparison uses constant-time algorithm."""
         # This test verifies hmac.compare_digest is used
         secret = "test_secret"
-        payload_str = json.dumps(mock_webhook_payload, sort_keys=True)
+        raw_body = json.dumps(mock_webhook_payload).encode()
         valid_signature = hmac.new(
             secret.encode(),
-            payload_str.encode(),
+            raw_body,
             hashlib.sha256
         ).hexdigest()
 
         # Valid signature should work
-        result1 = validate_webhook(mock_webhook_payload, valid_signature, secret)
+        result1 = validate_webhook(raw_body, valid_signature, secret)
         assert result1["valid"] is True
 
         # Invalid signature should fail
-        result2 = validate_webhook(mock_webhook_payload, "wrong", secret)
+        result2 = validate_webhook(raw_body, "wrong", secret)
         assert result2["valid"] is False
 
 
@@ -140,12 +192,12 @@ class TestFetchProposalData:
         # Mock HTTP responses
         mock_client = AsyncMock()
         mock_response = AsyncMock()
-        mock_response.json.side_effect = [
-            mock_offorte_proposal,
-            {"blocks": []},  # content
-            mock_offorte_company,
-            mock_offorte_contact
-        ]
+        type(mock_response).content = PropertyMock(side_effect=[
+            json.dumps(mock_offorte_proposal).encode(),
+            json.dumps({"blocks": []}).encode(),  # content
+            json.dumps(mock_offorte_company).encode(),
+            json.dumps(mock_offorte_contact).encode()
+        ])
         mock_response.raise_for_status = Mock()
         mock_client.get.return_value = mock_response
 
@@ -167,7 +219,7 @@ class TestFetchProposalData:
 
         mock_client = AsyncMock()
         mock_response = AsyncMock()
-        mock_response.json.return_value = mock_offorte_proposal
+        mock_response.content = json.dumps(mock_offorte_proposal).encode()
         mock_response.raise_for_status = Mock()
         mock_client.get.return_value = mock_response
 
@@ -185,23 +237,77 @@ class TestFetchProposalData:
         ctx.deps = test_deps
 
         mock_client = AsyncMock()
-        mock_response_fail = AsyncMock()
-        mock_response_fail.raise_for_status.side_effect = Exception("Network error")
 
         mock_response_success = AsyncMock()
-        mock_response_success.json.return_value = mock_offorte_proposal
+        mock_response_success.content = json.dumps(mock_offorte_proposal).encode()
         mock_response_success.raise_for_status = Mock()
 
         # First call fails, second succeeds
-        mock_client.get.side_effect = [mock_response_fail, mock_response_success]
+        mock_client.get.side_effect = [httpx.ConnectError("Network error"), mock_response_success]
 
         test_deps._http_client = mock_client
 
-        result = await fetch_proposal_data(ctx, 12345, include_content=False)
+        with patch("backend.agent.tools.asyncio.sleep", new=AsyncMock()):
+            result = await fetch_proposal_data(ctx, 12345, include_content=False)
 
         # Should eventually succeed after retry
         assert result["id"] == 12345
 
+    @pytest.mark.asyncio
+    async def test_fetch_proposal_client_error_not_retried(self, test_deps):
+        """Test 4xx responses fail fast instead of being retried."""
+        ctx = Mock(spec=RunContext)
+        ctx.deps = test_deps
+
+        request = httpx.Request("GET", "https://test-offorte.com/proposals/12345")
+        not_found = httpx.Response(404, request=request)
+
+        mock_client = AsyncMock()
+        mock_client.get.return_value = not_found
+        test_deps._http_client = mock_client
+
+        with patch("backend.agent.tools.asyncio.sleep", new=AsyncMock()) as mock_sleep:
+            result = await fetch_proposal_data(ctx, 12345, include_content=False)
+
+        assert "error" in result
+        assert mock_client.get.call_count == 1
+        mock_sleep.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_fetch_proposal_failed_contact_skipped(
+        self, test_deps, mock_offorte_proposal, mock_offorte_company, mock_offorte_contact
+    ):
+        """Test that a failing contact fetch does not fail the whole proposal."""
+        ctx = Mock(spec=RunContext)
+        ctx.deps = test_deps
+
+        def response_for(url, headers=None):
+            response = Mock()
+            response.raise_for_status = Mock()
+            if url.endswith("/contacts/235"):
+                response.raise_for_status.side_effect = Exception("404 Not Found")
+            elif "/contacts/" in url:
+                response.content = json.dumps(mock_offorte_contact).encode()
+            elif "/companies/" in url:
+                response.content = json.dumps(mock_offorte_company).encode()
+            elif url.endswith("/content"):
+                response.content = b'{"blocks": []}'
+            else:
+                response.content = json.dumps(mock_offorte_proposal).encode()
+            return response
+
+        mock_client = AsyncMock()
+        mock_client.get.side_effect = response_for
+        test_deps._http_client = mock_client
+
+        with patch("backend.agent.tools.asyncio.sleep", new=AsyncMock()):
+            result = await fetch_proposal_data(ctx, 12345, include_content=True)
+
+        assert "error" not in result
+        assert result["company"] == mock_offorte_company
+        assert result["contacts"] == [mock_offorte_contact]
+        assert result["content"] == {"blocks": []}
+
     @pytest.mark.asyncio
     async def test_fetch_proposal_api_error(self, test_deps):
         """Test handling of API errors."""
@@ -341,6 +447,23 @@ class TestParseConstructionElements:
 # Tool 4: transform_proposal_to_table_records
 # ============================================================================
 
+def _element(index, element_type, **fields):
+    """Parsed construction element with all fields the transforms read."""
+    return {
+        "element_id": f"2025001NL_{index}",
+        "type": element_type,
+        "brand": "Merk 1",
+        "location": None,
+        "width_mm": None,
+        "height_mm": None,
+        "coupled": False,
+        "variant": None,
+        "price": 0.0,
+        "notes": None,
+        **fields
+    }
+
+
 class TestTransformProposalToTableRecords:
     """Test data transformation to Airtable schemas."""
 
@@ -416,7 +539,7 @@ class TestTransformProposalToTableRecords:
         assert bij_start["Status"] == "Gepland"
 
         # Check 5% oplevering
-        oplevering = next(inv for inv in invoices if "5%" in inv["Factuur Type"])
+        oplevering = next(inv for inv in invoices if inv["Factuur Type"] == "5% - Oplevering")
         assert oplevering["Bedrag"] == 2250.00
         assert oplevering["Status"] == "Gepland"
 
@@ -436,6 +559,26 @@ class TestTransformProposalToTableRecords:
 
         # Should be close to original (within rounding)
         assert abs(total_invoiced - 12345.67) < 0.05
+        # Remainder goes to the final split, so cents add up exactly
+        assert round(total_invoiced, 2) == 12345.67
+
+    def test_transform_dates_share_one_clock_read(self, mock_offorte_proposal, mock_offorte_company):
+        """Test project and invoice dates are derived from the same day."""
+        proposal = {
+            **mock_offorte_proposal,
+            "company": mock_offorte_company
+        }
+
+        records = transform_proposal_to_table_records(proposal, [])
+
+        project = records["projecten"][0]
+        invoices = records["facturatie"]
+        start = datetime.strptime(project["Start Datum"], "%d-%m-%Y")
+
+        assert invoices[0]["Datum"] == project["Start Datum"]
+        assert project["Eind Datum"] == (start + timedelta(days=60)).strftime("%d-%m-%Y")
+        assert invoices[1]["Datum"] == (start + timedelta(days=14)).strftime("%d-%m-%Y")
+        assert invoices[2]["Datum"] == (start + timedelta(days=74)).strftime("%d-%m-%Y")
 
     def test_transform_measurement_planning(self, mock_offorte_proposal, mock_offorte_company):
         """Test inmeetplanning table transformation."""
@@ -443,7 +586,7 @@ class TestTransformProposalToTableRecords:
             **mock_offorte_proposal,
             "company": mock_offorte_company
         }
-        elements = [{"type": "Raam"}, {"type": "Deur"}, {"type": "Raam"}]
+        elements = [_element(0, "Raam"), _element(1, "Deur"), _element(2, "Raam")]
 
         records = transform_proposal_to_table_records(proposal, elements)
 
@@ -483,9 +626,9 @@ class TestTransformProposalToTableRecords:
         """Test deur_specificaties table transformation (only doors)."""
         proposal = mock_offorte_proposal
         elements = [
-            {"type": "Voordeur", "notes": "Test door"},
-            {"type": "Vast raam", "notes": "Test window"},
-            {"type": "Achterdeur", "notes": "Back door"}
+            _element(0, "Voordeur", notes="Test door"),
+            _element(1, "Vast raam", notes="Test window"),
+            _element(2, "Achterdeur", notes="Back door")
         ]
 
         records = transform_proposal_to_table_records(proposal, elements)
@@ -513,11 +656,14 @@ class TestSyncToAirtable:
             {"Order Nummer": "2025001NL", "Bedrijfsnaam": "Test Company"}
         ]
 
-        with patch("offorte_airtable_sync.tools.AirtableApi") as mock_api:
+        with patch.object(test_deps, "_airtable_api", Mock()) as mock_api:
             mock_table = Mock()
-            mock_table.all.return_value = []  # No existing records
-            mock_table.create.return_value = {"id": "recABC123"}
-            mock_api.return_value.table.return_value = mock_table
+            mock_table.batch_upsert.return_value = {
+                "createdRecords": ["recABC123"],
+                "updatedRecords": [],
+                "records": [{"id": "recABC123", "fields": {}}]
+            }
+            mock_api.table.return_value = mock_table
 
             result = await sync_to_airtable(
                 ctx,
@@ -542,11 +688,14 @@ class TestSyncToAirtable:
             {"Order Nummer": "2025001NL", "Bedrijfsnaam": "Updated Company"}
         ]
 
-        with patch("offorte_airtable_sync.tools.AirtableApi") as mock_api:
+        with patch.object(test_deps, "_airtable_api", Mock()) as mock_api:
             mock_table = Mock()
-            mock_table.all.return_value = [{"id": "recEXIST", "fields": {}}]
-            mock_table.update.return_value = {"id": "recEXIST"}
-            mock_api.return_value.table.return_value = mock_table
+            mock_table.batch_upsert.return_value = {
+                "createdRecords": [],
+                "updatedRecords": ["recEXIST"],
+                "records": [{"id": "recEXIST", "fields": {}}]
+            }
+            mock_api.table.return_value = mock_table
 
             result = await sync_to_airtable(
                 ctx,
@@ -572,11 +721,14 @@ class TestSyncToAirtable:
             for i in range(25)
         ]
 
-        with patch("offorte_airtable_sync.tools.AirtableApi") as mock_api:
+        with patch.object(test_deps, "_airtable_api", Mock()) as mock_api:
             mock_table = Mock()
-            mock_table.all.return_value = []
-            mock_table.create.return_value = {"id": "recNEW"}
-            mock_api.return_value.table.return_value = mock_table
+            mock_table.batch_upsert.side_effect = lambda batch, **kwargs: {
+                "createdRecords": [f"recNEW{i}" for i in range(len(batch))],
+                "updatedRecords": [],
+                "records": [{"id": f"recNEW{i}", "fields": {}} for i in range(len(batch))]
+            }
+            mock_api.table.return_value = mock_table
 
             result = await sync_to_airtable(
                 ctx,
@@ -587,28 +739,52 @@ class TestSyncToAirtable:
             )
 
         assert result["created"] == 25
-        # Verify create was called 25 times (once per record)
-        assert mock_table.create.call_count == 25
+        # Verify one upsert request per batch of 10
+        assert mock_table.batch_upsert.call_count == 3
+        assert [len(c.args[0]) for c in mock_table.batch_upsert.call_args_list] == [10, 10, 5]
+
+    @pytest.mark.asyncio
+    async def test_sync_records_without_key_field(self, test_deps):
+        """Test records without a key value are created, not upserted."""
+        ctx = Mock(spec=RunContext)
+        ctx.deps = test_deps
+
+        records = [{"Bedrijfsnaam": "No Key Company"}]
+
+        with patch.object(test_deps, "_airtable_api", Mock()) as mock_api:
+            mock_table = Mock()
+            mock_table.batch_create.return_value = [{"id": "recNOKEY", "fields": {}}]
+            mock_api.table.return_value = mock_table
+
+            result = await sync_to_airtable(ctx, "appBase", "table", records)
+
+        mock_table.batch_upsert.assert_not_called()
+        assert result["created"] == 1
+        assert result["record_ids"] == ["recNOKEY"]
 
     @pytest.mark.asyncio
     async def test_sync_rate_limiting(self, test_deps):
-        """Test rate limiting with sleep between batches."""
+        """Test every Airtable request goes through the shared rate limiter."""
         ctx = Mock(spec=RunContext)
         ctx.deps = test_deps
 
-        records = [{"Order Nummer": "2025001NL"}]
+        records = [{"Order Nummer": f"2025{i:03d}NL"} for i in range(15)] + [{"Naam": "No key"}]
 
-        with patch("offorte_airtable_sync.tools.AirtableApi") as mock_api:
-            with patch("offorte_airtable_sync.tools.asyncio.sleep") as mock_sleep:
-                mock_table = Mock()
-                mock_table.all.return_value = []
-                mock_table.create.return_value = {"id": "recNEW"}
-                mock_api.return_value.table.return_value = mock_table
+        with patch.object(test_deps, "_airtable_api", Mock()) as mock_api, \
+                patch.object(test_deps, "_airtable_limiter", MagicMock()) as mock_limiter:
+            mock_table = Mock()
+            mock_table.batch_upsert.return_value = {
+                "createdRecords": ["recNEW"],
+                "updatedRecords": [],
+                "records": [{"id": "recNEW", "fields": {}}]
+            }
+            mock_table.batch_create.return_value = [{"id": "recNOKEY", "fields": {}}]
+            mock_api.table.return_value = mock_table
 
-                await sync_to_airtable(ctx, "appBase", "table", records)
+            await sync_to_airtable(ctx, "appBase", "table", records)
 
-                # Should sleep after batch (0.21s for rate limit)
-                mock_sleep.assert_called()
+            # Two upsert batches plus one create for the unkeyed record
+            assert mock_limiter.__aenter__.await_count == 3
 
     @pytest.mark.asyncio
     async def test_sync_error_handling(self, test_deps):
@@ -618,8 +794,8 @@ class TestSyncToAirtable:
 
         records = [{"Order Nummer": "2025001NL"}]
 
-        with patch("offorte_airtable_sync.tools.AirtableApi") as mock_api:
-            mock_api.side_effect = Exception("Airtable API error")
+        with patch.object(test_deps, "_airtable_api", Mock()) as mock_api:
+            mock_api.table.side_effect = Exception("Airtable API error")
 
             result = await sync_to_airtable(ctx, "appBase", "table", records)
 
@@ -651,8 +827,8 @@ class TestProcessWonProposal:
             "content": {"blocks": []}
         }
 
-        with patch("offorte_airtable_sync.tools.fetch_proposal_data", return_value=complete_proposal):
-            with patch("offorte_airtable_sync.tools.sync_to_airtable") as mock_sync:
+        with patch("backend.agent.tools.fetch_proposal_data", return_value=complete_proposal):
+            with patch("backend.agent.tools.sync_to_airtable") as mock_sync:
                 mock_sync.return_value = {
                     "success": True,
                     "created": 1,
@@ -674,7 +850,7 @@ class TestProcessWonProposal:
         ctx = Mock(spec=RunContext)
         ctx.deps = test_deps
 
-        with patch("offorte_airtable_sync.tools.fetch_proposal_data") as mock_fetch:
+        with patch("backend.agent.tools.fetch_proposal_data") as mock_fetch:
             mock_fetch.return_value = {"error": "API error", "proposal_id": 12345}
 
             result = await process_won_proposal(ctx, 12345)
@@ -697,8 +873,8 @@ class TestProcessWonProposal:
             "content": {"blocks": []}
         }
 
-        with patch("offorte_airtable_sync.tools.fetch_proposal_data", return_value=complete_proposal):
-            with patch("offorte_airtable_sync.tools.sync_to_airtable") as mock_sync:
+        with patch("backend.agent.tools.fetch_proposal_data", return_value=complete_proposal):
+            with patch("backend.agent.tools.sync_to_airtable") as mock_sync:
                 mock_sync.return_value = {
                     "success": True,
                     "created": 1,
@@ -714,6 +890,35 @@ class TestProcessWonProposal:
 
         assert "sync_summary" in result
 
+    @pytest.mark.asyncio
+    async def test_process_won_proposal_table_failure_isolated(
+        self, test_deps, mock_offorte_proposal, mock_offorte_company
+    ):
+        """Test that one failing table does not abort the other table syncs."""
+        ctx = Mock(spec=RunContext)
+        ctx.deps = test_deps
+
+        complete_proposal = {
+            **mock_offorte_proposal,
+            "company": mock_offorte_company,
+            "contacts": [],
+            "content": {"blocks": []}
+        }
+
+        async def fake_sync(ctx, base_id, table_name, records, key_field="Order Nummer"):
+            if table_name == "projecten":
+                raise Exception("Airtable unavailable")
+            return {"success": True, "created": 1, "updated": 0, "failed": 0, "errors": []}
+
+        with patch("backend.agent.tools.fetch_proposal_data", return_value=complete_proposal):
+            with patch("backend.agent.tools.sync_to_airtable", side_effect=fake_sync):
+                result = await process_won_proposal(ctx, 12345)
+
+        assert result["success"] is False
+        assert "projecten" not in result["sync_summary"]
+        assert "klantenportaal" in result["sync_summary"]
+        assert any("Airtable unavailable" in e for e in result["errors"])
+
     @pytest.mark.asyncio
     async def test_process_won_proposal_performance_tracking(self, test_deps, mock_offorte_proposal):
         """Test that processing time is tracked."""
@@ -727,8 +932,8 @@ class TestProcessWonProposal:
             "content": {"blocks": []}
         }
 
-        with patch("offorte_airtable_sync.tools.fetch_proposal_data", return_value=complete_proposal):
-            with patch("offorte_airtable_sync.tools.sync_to_airtable") as mock_sync:
+        with patch("backend.agent.tools.fetch_proposal_data", return_value=complete_proposal):
+            with patch("backend.agent.tools.sync_to_airtable") as mock_sync:
                 mock_sync.return_value = {
                     "success": True,
                     "created": 0,